@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+benchmark.py
+
+Misura la build completa contro il server di prova locale (mock_api.py), senza
+toccare le API vere.
+- Per ogni dimensione del catalogo (--sizes, default 1000,10000,50000) esegue in
+  una cartella temporanea ingest.py e i generatori (generate_index.py,
+  generate_movies_page.py, tvmov.py, film.py), ognuno in un processo separato
+- Per ogni fase riporta tempo, richieste servite dal server (con 429, errori e
+  304), picco di memoria (RSS) e dimensione dei file prodotti; nel report
+  JSON anche le fasi interne di ogni script (vedi build_report.py)
+- Latenza, errori 5xx e 429 del server configurabili (di default 429 oltre 100
+  dettagli al secondo); --json salva il report
+- `benchmark.py record` registra risposte di dettaglio vere (serve TMDB_API_KEY)
+  in una cartella da passare poi con --fixtures
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_api import MockAPI
+
+# --- Config ---
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = "1000,10000,50000"
+DEFAULT_RATE = "200"     # TMDB_RATE di partenza: sopra --rate-limit, così si misura anche l'adattamento ai 429
+RECORD_SAMPLE = 50
+REPORT_NAME = "build-report.json"
+# fase -> (argomenti dello script, file o cartelle prodotti)
+STAGES = {
+    "ingest": (["ingest.py", "--changes", "--tv-episodes"], ["catalog.json"]),
+    "generate_index": (["generate_index.py"], ["index.html", "sw.js", "sw-manifest.json", "data", "assets"]),
+    "generate_movies_page": (["generate_movies_page.py"], ["movies_miniplayers.html"]),
+    "tvmov": (["tvmov.py"], ["tvmov.html"]),
+    "film": (["film.py"], ["movies.html"]),
+}
+
+
+def output_size(workdir, names):
+    total = 0
+    for name in names:
+        path = os.path.join(workdir, name)
+        if os.path.isdir(path):
+            total += sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+        elif os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+
+def run_stage(name, workdir, env, api):
+    """Esegue una fase in un processo figlio e ne restituisce le misure."""
+    args, outputs = STAGES[name]
+    before = api.snapshot()
+    start = time.perf_counter()
+    with open(os.path.join(workdir, f"{name}.log"), "w", encoding="utf-8") as log:
+        proc = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, args[0])] + args[1:],
+                                cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        # wait4 restituisce le risorse usate da questo solo processo (ru_maxrss in KiB su Linux)
+        _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - start
+    after = api.snapshot()
+    requests = {key: after.get(key, 0) - before.get(key, 0) for key in after}
+    return {
+        "stage": name,
+        "exit": proc.returncode,
+        "wall": round(wall, 3),
+        "requests": sum(v for k, v in requests.items() if k not in ("throttled", "errors", "not_modified")),
+        "detail": {k: v for k, v in requests.items() if v},
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+        "output_bytes": output_size(workdir, outputs),
+    }
+
+
+def stage_report(workdir, name):
+    """Sezione dello script nel report di build_report.py (vuota se lo script non lo scrive)."""
+    try:
+        with open(os.path.join(workdir, REPORT_NAME), encoding="utf-8") as f:
+            return json.load(f)["scripts"].get(name, {})
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def run_size(size, args, stages):
+    api = MockAPI(size, args.latency, args.error_rate, args.throttle_rate, args.fixtures,
+                  rate_limit=args.rate_limit).start()
+    workdir = tempfile.mkdtemp(prefix=f"bench-{size}-")
+    env = dict(os.environ, **api.env())
+    env.update(TMDB_CACHE_PATH=os.path.join(workdir, ".cache", "tmdb.sqlite"), TMDB_RATE=args.rate,
+               FILM_DELAY="0", PYTHONPATH=REPO_DIR, BUILD_REPORT=os.path.join(workdir, REPORT_NAME))
+    env.pop("BUILD_PROFILE", None)
+    env.pop("GITHUB_OUTPUT", None)
+    if args.concurrency:
+        env["TMDB_CONCURRENCY"] = str(args.concurrency)
+    results = []
+    try:
+        for name in stages:
+            result = run_stage(name, workdir, env, api)
+            result["size"] = size
+            result["report"] = stage_report(workdir, name)
+            results.append(result)
+            print_row(result)
+    finally:
+        api.stop()
+        if args.keep:
+            print(f"  file della prova in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def print_row(r):
+    status = "ok" if r["exit"] == 0 else f"errore (exit {r['exit']})"
+    extra = ", ".join(f"{k} {v}" for k, v in sorted(r["detail"].items()))
+    print(f"{r['size']:>7} {r['stage']:<21} {r['wall']:>9.2f}s {r['requests']:>8} "
+          f"{r['peak_rss_mb']:>8.1f}MB {r['output_bytes'] / 1e6:>9.2f}MB  {status}  {extra}")
+
+
+def record(args):
+    """Salva RECORD_SAMPLE risposte di dettaglio vere per tipo in <fixtures>/<tipo>.jsonl."""
+    from ingest import APPEND, LANGUAGE
+    from tmdb_client import SRC_URLS, TMDbClient, get_api_key
+
+    os.makedirs(args.fixtures, exist_ok=True)
+    client = TMDbClient(get_api_key())
+    try:
+        for type_, url in SRC_URLS.items():
+            ids, _ = client.fetch_list(url)
+            ids = ids[:args.sample]
+            with open(os.path.join(args.fixtures, f"{type_}.jsonl"), "w", encoding="utf-8") as f:
+                for tmdb_id in ids:
+                    info = client.details(type_, tmdb_id, LANGUAGE, APPEND)
+                    if info:
+                        f.write(json.dumps(info, ensure_ascii=False) + "\n")
+            print(f"Registrate {len(ids)} risposte {type_} in {args.fixtures}")
+    finally:
+        client.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark della build contro un server locale")
+    parser.add_argument("command", nargs="?", default="run", choices=("run", "record"))
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="titoli nel catalogo, separati da virgola")
+    parser.add_argument("--stages", default=",".join(STAGES), help="fasi da eseguire, in ordine")
+    parser.add_argument("--latency", type=float, default=0.02, help="secondi di attesa per richiesta")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="quota di dettagli con errore 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="quota casuale di dettagli con errore 429")
+    parser.add_argument("--rate-limit", type=int, default=100, help="dettagli al secondo oltre i quali il server risponde 429")
+    parser.add_argument("--rate", default=DEFAULT_RATE, help="TMDB_RATE per gli script")
+    parser.add_argument("--concurrency", type=int, help="TMDB_CONCURRENCY per gli script")
+    parser.add_argument("--fixtures", help="cartella delle risposte registrate (movie.jsonl, tv.jsonl)")
+    parser.add_argument("--sample", type=int, default=RECORD_SAMPLE, help="risposte da registrare per tipo")
+    parser.add_argument("--json", help="salva il report in questo file")
+    parser.add_argument("--keep", action="store_true", help="non cancellare le cartelle della prova")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    if args.command == "record":
+        if not args.fixtures:
+            sys.exit("Errore: indicare la cartella con --fixtures")
+        record(args)
+        return
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        sys.exit(f"Errore: fasi sconosciute {', '.join(unknown)} (disponibili: {', '.join(STAGES)})")
+
+    print(f"{'titoli':>7} {'fase':<21} {'tempo':>10} {'richieste':>8} {'RSS':>10} {'output':>11}")
+    results = []
+    for size in (int(s) for s in args.sizes.split(",") if s):
+        results.extend(run_size(size, args, stages))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": {k: v for k, v in vars(args).items() if k != "command"}, "results": results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"Report salvato in {args.json}")
+    if any(r["exit"] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+build_report.py
+
+Strumentazione comune agli script della build, salvata in un report JSON.
+- stage(nome): tempo reale e di CPU di una fase (sommati se la fase si ripete)
+- observe(endpoint, secondi): istogramma delle latenze per endpoint (list,
+  details, seasons, changes, image), registrato da TMDbClient
+- count(nome): contatori, ad esempio ritentativi e 429 per endpoint, hit e
+  miss della cache TMDb
+- drop(tipo, id, motivo): ID rimasti senza dettagli, con il motivo
+- session(script, report, profile): attorno al main di uno script; con
+  --report (o BUILD_REPORT) aggiunge la sezione dello script al file JSON, così
+  più script dello stesso workflow scrivono nello stesso report; con --profile
+  (o BUILD_PROFILE) salva anche il profilo cProfile (solo del thread
+  principale: le richieste nei thread di fetch_engine restano fuori)
+"""
+
+import contextlib
+import cProfile
+import json
+import os
+import threading
+import time
+
+# --- Config ---
+REPORT_ENV = "BUILD_REPORT"
+PROFILE_ENV = "BUILD_PROFILE"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)   # secondi, limite superiore
+DROP_LIMIT = 1000   # ID scartati elencati uno per uno; oltre si contano soltanto
+
+_lock = threading.Lock()
+_data = {}
+
+
+def reset():
+    _data.clear()
+    _data.update(stages={}, endpoints={}, counters={}, dropped={"count": 0, "reasons": {}, "ids": []})
+
+
+reset()
+
+
+@contextlib.contextmanager
+def stage(name):
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        with _lock:
+            entry = _data["stages"].setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0, "calls": 0})
+            entry["wall_s"] += wall
+            entry["cpu_s"] += cpu
+            entry["calls"] += 1
+
+
+def bucket_label(limit):
+    return f"<={int(limit * 1000)}ms"
+
+
+def observe(endpoint, seconds):
+    with _lock:
+        entry = _data["endpoints"].get(endpoint)
+        if entry is None:
+            entry = _data["endpoints"][endpoint] = {
+                "count": 0, "total_s": 0.0, "max_s": 0.0,
+                "buckets": {**{bucket_label(b): 0 for b in LATENCY_BUCKETS}, "inf": 0}}
+        entry["count"] += 1
+        entry["total_s"] += seconds
+        entry["max_s"] = max(entry["max_s"], seconds)
+        label = next((bucket_label(b) for b in LATENCY_BUCKETS if seconds <= b), "inf")
+        entry["buckets"][label] += 1
+
+
+def count(name, value=1):
+    with _lock:
+        _data["counters"][name] = _data["counters"].get(name, 0) + value
+
+
+def drop(type_, tmdb_id, reason):
+    with _lock:
+        dropped = _data["dropped"]
+        dropped["count"] += 1
+        dropped["reasons"][reason] = dropped["reasons"].get(reason, 0) + 1
+        if len(dropped["ids"]) < DROP_LIMIT:
+            dropped["ids"].append({"type": type_, "id": tmdb_id, "reason": reason})
+
+
+def add_arguments(parser):
+    parser.add_argument("--report", default=os.getenv(REPORT_ENV),
+                        help=f"aggiunge tempi e contatori a questo report JSON (default ${REPORT_ENV})")
+    parser.add_argument("--profile", default=os.getenv(PROFILE_ENV),
+                        help=f"salva il profilo cProfile in questo file (default ${PROFILE_ENV})")
+
+
+def snapshot():
+    with _lock:
+        data = json.loads(json.dumps(_data))
+    for entry in data["stages"].values():
+        entry["wall_s"], entry["cpu_s"] = round(entry["wall_s"], 4), round(entry["cpu_s"], 4)
+    for entry in data["endpoints"].values():
+        entry["mean_s"] = round(entry["total_s"] / entry["count"], 4) if entry["count"] else 0.0
+        entry["total_s"], entry["max_s"] = round(entry["total_s"], 4), round(entry["max_s"], 4)
+    return data
+
+
+def write_report(path, script, section):
+    """Aggiunge (o sostituisce) la sezione dello script nel report JSON."""
+    report = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            try:
+                report = json.load(f)
+            except ValueError:
+                report = {}
+    report.setdefault("scripts", {})[script] = section
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+@contextlib.contextmanager
+def session(script, report=None, profile=None):
+    """Misura tutto il main di uno script e alla fine scrive report e profilo."""
+    profiler = cProfile.Profile() if profile else None
+    started = time.time()
+    status = "ok"
+    if profiler:
+        profiler.enable()
+    try:
+        with stage("total"):
+            yield
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            status = f"uscita: {e.code}"
+        raise
+    except BaseException as e:
+        status = f"errore: {type(e).__name__}: {e}"
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile)
+        if report:
+            write_report(report, script, {"started_at": started, "status": status, **snapshot()})
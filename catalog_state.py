@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+catalog_state.py
+
+Dataset del catalogo, scritto da ingest.py e letto da tutti i generatori.
+- Per tipo: gli ID nell'ordine della lista vixsrc e i record già costruiti
+  (CATALOG_PATH, default catalog.json)
+- Calcola gli ID aggiunti e rimossi rispetto alle nuove liste vixsrc
+- Sceglie a rotazione una piccola fetta di record vecchi da riscaricare
+  (CATALOG_STALE_REFRESH, default 50 per tipo) tra quelli più vecchi di
+  CATALOG_STALE_AGE secondi (default 7 giorni, come la cache TMDb), oppure
+  solo quelli segnalati dal feed /changes di TMDb
+- Journal di ripresa (CATALOG_JOURNAL, default <dataset>.journal): ogni voce
+  scaricata vi viene aggiunta subito come riga JSON, così una build interrotta
+  riparte dagli ID già fatti; a fine build confluisce nel dataset e si cancella
+- Scritto con un record per riga (resta JSON valido): i generatori delle
+  pagine lo leggono un record alla volta con iter_records(), senza caricarlo
+  tutto in memoria
+- Shard (--shard i/N di ingest.py): ogni ID appartiene allo shard scelto dal
+  suo crc32, stabile tra esecuzioni e macchine; ogni shard scrive un dataset
+  parziale (catalog.shard-i-of-N.json) e merge_shards() li ricompone
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+
+from entries import Entry
+from json_stream import write_stream
+
+STATE_PATH = os.getenv("CATALOG_PATH", "catalog.json")
+try:
+    STALE_REFRESH = int(os.getenv("CATALOG_STALE_REFRESH", 50))
+except ValueError:
+    STALE_REFRESH = 50
+try:
+    STALE_AGE = int(os.getenv("CATALOG_STALE_AGE", 7 * 24 * 3600))
+except ValueError:
+    STALE_AGE = 7 * 24 * 3600
+JOURNAL_SYNC = 100   # righe del journal tra un fsync e l'altro
+_STATE_HEAD = '{"types":{\n'
+_RECORDS_OPEN = '"records":{\n'
+
+
+def journal_path(path=STATE_PATH):
+    return os.getenv("CATALOG_JOURNAL") or path + ".journal"
+
+
+def _trim_partial_line(path):
+    """Taglia la riga incompleta lasciata da un'interruzione, che altrimenti si salderebbe alla successiva."""
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        return
+    with f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            start = max(0, pos - 4096)
+            f.seek(start)
+            newline = f.read(pos - start).rfind(b"\n")
+            if newline >= 0:
+                pos = start + newline + 1
+                break
+            pos = start
+        if pos < end:
+            f.truncate(pos)
+
+
+class Journal:
+    """Journal JSONL delle voci scaricate: una riga {"type", "id", "entry", "fetched_at"}."""
+
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        _trim_partial_line(path)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def append(self, type_, tmdb_id, entry, now=None):
+        line = json.dumps({"type": type_, "id": tmdb_id, "entry": entry, "fetched_at": now or time.time()},
+                          ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self._pending += 1
+            if self._pending >= JOURNAL_SYNC:
+                os.fsync(self._file.fileno())
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def discard(self):
+        """Da chiamare dopo aver salvato il dataset: il contenuto è già lì."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def read_journal(path, max_age=STALE_AGE, now=None):
+    """{tipo: {id: entry}} dal journal di una build interrotta ({} se non c'è).
+
+    Le righe troncate da un'interruzione vengono saltate, come le voci più
+    vecchie di max_age.
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    oldest = (now or time.time()) - max_age
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue
+            if item.get("fetched_at", 0) >= oldest:
+                done.setdefault(item["type"], {})[item["id"]] = item["entry"]
+    return done
+
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {"types": {}}
+    state.setdefault("types", {})
+    return state
+
+
+def _missing_dataset(path):
+    print(f"Errore: dataset {path} assente o vuoto, esegui prima ingest.py", file=sys.stderr)
+    sys.exit(1)
+
+
+def load_dataset(path=STATE_PATH):
+    """Dataset per i generatori; esce con un errore se manca."""
+    state = load_state(path)
+    if not state["types"]:
+        _missing_dataset(path)
+    return state
+
+
+def iter_records(path=STATE_PATH):
+    """(tipo, dati del tipo senza i record, id, record) leggendo il dataset una riga alla volta.
+
+    Vale per il formato di save_state(); un file scritto diversamente viene
+    caricato per intero con load_state().
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        if f.readline() == _STATE_HEAD:
+            type_ = head = None
+            for line in f:
+                if line.endswith(_RECORDS_OPEN):
+                    # "movie":{"ids":[...],...,"records":{
+                    (type_, head), = json.loads("{" + line[:-len(_RECORDS_OPEN)].rstrip(",") + "}}").items()
+                elif line.startswith("}}"):
+                    type_ = None
+                elif type_ is not None:
+                    (tmdb_id, record), = json.loads("{" + line.rstrip().rstrip(",") + "}").items()
+                    yield type_, head, tmdb_id, record
+            return
+    for type_, type_state in load_state(path)["types"].items():
+        head = {key: value for key, value in type_state.items() if key != "records"}
+        for tmdb_id, record in type_state.get("records", {}).items():
+            yield type_, head, tmdb_id, record
+
+
+def stream_entries(path=STATE_PATH, fields=None):
+    """Entry di tutti i tipi, in ordine di ID per tipo, leggendo un record alla volta.
+
+    Con `fields` le Entry tengono solo quei campi: trama, cast ed episodi non
+    usati dalla pagina non restano in memoria. Esce con un errore se il
+    dataset manca.
+    """
+    listed, by_type = {}, {}
+    for type_, head, tmdb_id, record in iter_records(path):
+        if type_ not in listed:
+            listed[type_], by_type[type_] = set(head.get("ids", [])), []
+        if tmdb_id in listed[type_]:
+            entry = record["entry"]
+            if fields is not None:
+                entry = {name: entry[name] for name in fields if name in entry}
+            by_type[type_].append((int(tmdb_id), Entry.from_dict(entry)))
+    if not by_type:
+        _missing_dataset(path)
+    return [entry for rows in by_type.values() for _, entry in sorted(rows, key=lambda row: row[0])]
+
+
+def type_entries(state, type_):
+    """(ID nell'ordine della lista vixsrc, {id: Entry}) per un tipo del dataset."""
+    type_state = state["types"].get(type_, {})
+    records = type_state.get("records", {})
+    return (type_state.get("ids", []),
+            {tmdb_id: Entry.from_dict(record["entry"]) for tmdb_id, record in records.items()})
+
+
+def _dump(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _state_lines(state):
+    """Il dataset come JSON con una riga per record (le stringhe JSON non contengono a capo)."""
+    yield _STATE_HEAD
+    types = list(state["types"].items())
+    for n, (type_, type_state) in enumerate(types):
+        head = _dump({key: value for key, value in type_state.items() if key != "records"})[:-1]
+        yield _dump(type_) + ":" + head + ("," if head != "{" else "") + _RECORDS_OPEN
+        records = list(type_state.get("records", {}).items())
+        for i, (tmdb_id, record) in enumerate(records):
+            yield _dump(tmdb_id) + ":" + _dump(record) + ("," if i < len(records) - 1 else "") + "\n"
+        yield "}}" + ("," if n < len(types) - 1 else "") + "\n"
+    rest = _dump({key: value for key, value in state.items() if key != "types"})
+    yield "}" + ("," + rest[1:] if rest != "{}" else "}") + "\n"
+
+
+def save_state(state, path=STATE_PATH):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_stream(path, _state_lines(state))
+
+
+def diff_ids(previous_ids, ids):
+    """Restituisce (aggiunti, rimossi) mantenendo l'ordine della lista nuova."""
+    previous = set(previous_ids)
+    current = set(ids)
+    added = [i for i in dict.fromkeys(ids) if i not in previous]
+    removed = [i for i in dict.fromkeys(previous_ids) if i not in current]
+    return added, removed
+
+
+def plan_fetch(type_state, ids, stale_limit=STALE_REFRESH, stale_age=STALE_AGE, now=None):
+    """ID da scaricare: quelli senza record più i `stale_limit` record scaduti più vecchi."""
+    records = type_state.get("records", {})
+    unique = list(dict.fromkeys(ids))
+    missing = [i for i in unique if i not in records]
+    expired = (now or time.time()) - stale_age
+    present = [i for i in unique if i in records and records[i].get("fetched_at", 0) <= expired]
+    present.sort(key=lambda i: records[i].get("fetched_at", 0))
+    return missing, present[:max(0, stale_limit)]
+
+
+def plan_changes(type_state, ids, changed):
+    """Come plan_fetch, ma si riscaricano solo i record cambiati su TMDb.
+
+    Vi si aggiungono i record il cui aggiornamento è fallito l'ultima volta
+    (type_state["pending"]), che il feed non segnalerebbe più.
+    """
+    records = type_state.get("records", {})
+    retry = changed | set(type_state.get("pending", []))
+    unique = list(dict.fromkeys(ids))
+    missing = [i for i in unique if i not in records]
+    stale = [i for i in unique if i in records and i in retry]
+    return missing, stale
+
+
+def merge_records(type_state, ids, fetched, now=None):
+    """Aggiorna i record con quelli appena scaricati e scarta gli ID rimossi.
+
+    `fetched` è un dict id -> entry (None se la richiesta è fallita: in quel
+    caso il record precedente, se c'è, viene mantenuto).
+    """
+    now = now or time.time()
+    records = type_state.get("records", {})
+    current = set(ids)
+    merged = {i: r for i, r in records.items() if i in current}
+    for tmdb_id, entry in fetched.items():
+        if entry is not None:
+            merged[tmdb_id] = {"entry": entry, "fetched_at": now}
+    type_state["records"] = merged
+    type_state["ids"] = list(ids)
+    return merged
+
+
+def parse_shard(value):
+    """"i/N" -> (i, N) con 1 <= i <= N; ValueError se non è valido."""
+    index, _, count = value.partition("/")
+    index, count = int(index), int(count)
+    if not 1 <= index <= count:
+        raise ValueError(f"shard {value} fuori intervallo")
+    return index, count
+
+
+def in_shard(tmdb_id, shard):
+    index, count = shard
+    return zlib.crc32(str(tmdb_id).encode()) % count == index - 1
+
+
+def shard_path(path, shard):
+    """catalog.json -> catalog.shard-2-of-4.json (anche per il journal)."""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.shard-{shard[0]}-of-{shard[1]}{ext}"
+
+
+def partial_state(state, shard, listed, changed):
+    """Dataset parziale di uno shard: ID, record e pending solo dello shard.
+
+    `listed` sono le liste vixsrc complete per tipo: merge_shards() ne
+    riprende l'ordine; `changed` dice se lo shard ha aggiornato qualcosa.
+    """
+    partial = {key: value for key, value in state.items() if key != "types"}
+    partial["types"] = {}
+    for type_, type_state in state["types"].items():
+        ids = listed.get(type_, type_state.get("ids", []))
+        mine = [i for i in ids if in_shard(i, shard)]
+        current = set(mine)
+        partial["types"][type_] = {
+            **type_state,
+            "ids": mine,
+            "records": {i: r for i, r in type_state.get("records", {}).items() if i in current},
+            "pending": [i for i in type_state.get("pending", []) if i in current],
+            "listed": list(ids),
+        }
+    partial["shard"] = {"index": shard[0], "count": shard[1], "changed": changed}
+    return partial
+
+
+def merge_shards(partials):
+    """Dataset completo dai dataset parziali di tutti gli shard, in qualunque ordine.
+
+    Liste, source e gli altri campi vengono dallo shard 1; di ogni shard si
+    prendono solo i record degli ID che gli appartengono. changes_since è il
+    più vecchio, così nessuna modifica del feed va persa. Restituisce
+    (dataset, changed); ValueError se manca uno shard.
+    """
+    partials = sorted(partials, key=lambda p: p["shard"]["index"])
+    count = partials[0]["shard"]["count"] if partials else 0
+    found = [(p["shard"]["index"], p["shard"]["count"]) for p in partials]
+    if not partials:
+        raise ValueError("nessun dataset parziale")
+    if found != [(i, count) for i in range(1, count + 1)]:
+        raise ValueError(f"shard incompleti: trovati {found}")
+    state = {key: value for key, value in partials[0].items() if key not in ("types", "shard")}
+    since = [p.get("changes_since") for p in partials]
+    if all(since):
+        state["changes_since"] = min(since)
+    else:
+        state.pop("changes_since", None)
+    state["types"] = {}
+    for type_ in dict.fromkeys(t for p in partials for t in p["types"]):
+        first = partials[0]["types"].get(type_, {})
+        ids = first.get("listed", first.get("ids", []))
+        records, pending = {}, []
+        for p in partials:
+            shard = (p["shard"]["index"], count)
+            type_state = p["types"].get(type_, {})
+            records.update((i, r) for i, r in type_state.get("records", {}).items() if in_shard(i, shard))
+            pending += [i for i in type_state.get("pending", []) if in_shard(i, shard)]
+        current = set(ids)
+        merged = {key: value for key, value in first.items() if key != "listed"}
+        merged.update(ids=list(ids), records={i: records[i] for i in dict.fromkeys(ids) if i in records},
+                      pending=[i for i in pending if i in current])
+        state["types"][type_] = merged
+    return state, any(p["shard"]["changed"] for p in partials)
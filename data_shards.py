@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+data_shards.py
+
+Scrive il catalogo come file JSON esterni caricati dalla pagina su richiesta.
+- Un file per tipo e per pagina da PAGE_SIZE elementi (lo stesso passo di render())
+  con i soli campi della griglia, in formato colonnare (un array per campo)
+- I campi usati solo dalla scheda info (trama, cast, stagioni, episodi) vanno
+  in file di dettaglio separati, raggruppati a DETAIL_BUNDLE titoli per file
+- Un indice di ricerca e uno dei generi per tipo (vedi search_index.py); nei
+  record i generi sono ID interi del dizionario `genres` del manifest
+- Restituisce un manifest piccolo da incorporare nell'HTML
+- I nomi dei file contengono l'hash del contenuto (movie-0.<hash>.json): un file
+  che non cambia mantiene il nome e resta valido nelle cache del browser
+- Ad ogni build i file della build precedente vengono rimossi
+"""
+
+import hashlib
+import json
+import os
+
+from entries import columns, genre_dictionary
+from search_index import build_genre_index, build_search_index
+
+DATA_DIR = "data"
+PAGE_SIZE = 40
+DETAIL_BUNDLE = 40
+HASH_LENGTH = 10
+GRID_FIELDS = ("id", "title", "poster", "thumb", "genres", "vote", "year", "duration")
+DETAIL_FIELDS = ("overview", "cast", "seasons", "episodes", "episode_info")
+
+
+def write_hashed(data_dir, stem, obj):
+    """Scrive stem.<hash>.json e restituisce il nome del file."""
+    text = json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    name = f"{stem}.{hashlib.sha256(text.encode('utf-8')).hexdigest()[:HASH_LENGTH]}.json"
+    with open(os.path.join(data_dir, name), "w", encoding="utf-8") as f:
+        f.write(text)
+    return name
+
+
+def script_json(obj):
+    """JSON sicuro da incorporare dentro un tag <script>."""
+    return json.dumps(obj, ensure_ascii=False).replace("</", "<\\/")
+
+
+def clear_data_dir(data_dir=DATA_DIR):
+    os.makedirs(data_dir, exist_ok=True)
+    for name in os.listdir(data_dir):
+        if name.endswith(".json"):
+            os.remove(os.path.join(data_dir, name))
+
+
+def write_pages(items, data_dir, prefix, size, fields, genre_ids=None, drop_empty=False):
+    names = []
+    for page, start in enumerate(range(0, len(items), size)):
+        chunk = columns(items[start:start + size], fields, genre_ids, drop_empty)
+        names.append(write_hashed(data_dir, f"{prefix}-{page}", chunk))
+    return names
+
+
+def write_shards(entries, data_dir=DATA_DIR, page_size=PAGE_SIZE, detail_bundle=DETAIL_BUNDLE):
+    """Divide le voci per tipo e pagina e scrive i file di griglia e di dettaglio."""
+    clear_data_dir(data_dir)
+    by_type = {}
+    for entry in entries:
+        by_type.setdefault(entry.type, []).append(entry)
+
+    genres = genre_dictionary(entries)
+    genre_ids = {name: gid for gid, name in enumerate(genres)}
+    manifest = {"dir": data_dir, "pageSize": page_size, "detailSize": detail_bundle,
+                "genres": genres, "types": {}}
+    for type_, items in by_type.items():
+        pages = write_pages(items, data_dir, type_, page_size, GRID_FIELDS, genre_ids)
+        details = write_pages(items, data_dir, f"{type_}-details", detail_bundle, DETAIL_FIELDS,
+                              drop_empty=True)
+        search = write_hashed(data_dir, f"{type_}-search", build_search_index(items))
+        genre_index = write_hashed(data_dir, f"{type_}-genres", build_genre_index(items, genre_ids))
+        type_genres = sorted({genre_ids[g] for item in items for g in item.genres})
+        manifest["types"][type_] = {"count": len(items), "pages": pages, "details": details,
+                                    "search": search, "genreIndex": genre_index, "genres": type_genres}
+    return manifest
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+entries.py
+
+Rappresentazione compatta delle voci del catalogo, comune a tutti i generatori.
+- Entry: record con __slots__, senza un dict per ogni titolo
+- Il cast è troncato ai nomi mostrati dalla scheda info (CAST_LIMIT)
+- Episodi delle serie (titolo, data, immagine) per stagione, solo se
+  scaricati da ingest.py --tv-episodes
+- columns(): uscita colonnare, un array per campo invece delle chiavi ripetute
+  su ogni titolo, con i generi come ID interi
+"""
+
+import copy
+import os
+
+TMDB_IMAGE_ROOT = os.getenv("TMDB_IMAGE_ROOT", "https://image.tmdb.org/t/p").rstrip("/")
+TMDB_IMAGE_BASE = TMDB_IMAGE_ROOT + "/w300"
+VIX_LINK_MOVIE = "https://vixsrc.to/movie/{}/?"
+CAST_LIMIT = 5
+
+DEFAULTS = {
+    "id": "",
+    "title": "",
+    "poster": "",
+    "thumb": "",          # chiave delle miniature locali (vedi posters.py)
+    "genres": [],
+    "vote": 0,
+    "overview": "",
+    "link": "",
+    "type": "movie",
+    "seasons": 0,
+    "episodes": {},
+    "duration": 0,
+    "year": "",
+    "cast": [],
+    "episode_info": {},   # stagione -> {"air_date", "episodes": [[titolo, data, immagine]]}
+}
+FIELDS = tuple(DEFAULTS)
+
+
+class Entry:
+    __slots__ = FIELDS
+
+    def __init__(self, **values):
+        for name in FIELDS:
+            setattr(self, name, values[name] if name in values else copy.copy(DEFAULTS[name]))
+        self.cast = list(self.cast)[:CAST_LIMIT]
+
+    @classmethod
+    def from_tmdb(cls, type_, tmdb_id, info):
+        tv = type_ == "tv"
+        return cls(
+            id=tmdb_id,
+            title=info.get("title") or info.get("name") or f"ID {tmdb_id}",
+            poster=TMDB_IMAGE_BASE + info["poster_path"] if info.get("poster_path") else "",
+            genres=[g["name"] for g in info.get("genres", [])],
+            vote=info.get("vote_average", 0),
+            overview=info.get("overview", ""),
+            link=VIX_LINK_MOVIE.format(tmdb_id) if not tv else "",
+            type=type_,
+            seasons=info.get("number_of_seasons", 1) if tv else 0,
+            episodes={str(s["season_number"]): s.get("episode_count", 1)
+                      for s in info.get("seasons", []) if s.get("season_number")} if tv else {},
+            duration=(info.get("runtime") or 0) if not tv else 0,
+            year=(info.get("release_date") or info.get("first_air_date") or "")[:4],
+            cast=[c["name"] for c in (info.get("credits") or {}).get("cast", [])],
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{k: v for k, v in data.items() if k in DEFAULTS})
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in FIELDS}
+
+
+def season_episodes(season):
+    """Forma compatta di una stagione TMDb per Entry.episode_info."""
+    return {
+        "air_date": season.get("air_date") or "",
+        "episodes": [[ep.get("name") or "", ep.get("air_date") or "",
+                      TMDB_IMAGE_BASE + ep["still_path"] if ep.get("still_path") else ""]
+                     for ep in season.get("episodes", [])],
+    }
+
+
+def season_unchanged(cached, season):
+    """True se la stagione salvata ha ancora la stessa data e lo stesso numero di episodi."""
+    return (cached is not None
+            and cached["air_date"] == (season.get("air_date") or "")
+            and len(cached["episodes"]) == season.get("episode_count"))
+
+
+def columns(entries, fields, genre_ids=None, drop_empty=False):
+    """Un array per campo; con drop_empty le colonne tutte vuote vengono omesse."""
+    out = {}
+    for name in fields:
+        values = [getattr(e, name) for e in entries]
+        if name == "genres" and genre_ids is not None:
+            values = [[genre_ids[g] for g in v] for v in values]
+        if drop_empty and not any(values):
+            continue
+        out[name] = values
+    return out
+
+
+def genre_dictionary(entries):
+    """Nomi dei generi in ordine alfabetico; l'indice nella lista è l'ID del genere."""
+    return sorted({g for entry in entries for g in entry.genres})
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+fetch_engine.py
+
+Motore di scaricamento concorrente per i dettagli TMDb.
+- Esegue le richieste per-ID in parallelo su un pool di thread limitato
+- Concorrenza configurabile con TMDB_CONCURRENCY (default 8)
+- I risultati escono nello stesso ordine degli ID in ingresso
+- Un errore su un singolo ID non interrompe gli altri (risultato None)
+"""
+
+import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CONCURRENCY = 8
+# Quante richieste tenere in volo per ogni worker prima di restituire risultati
+WINDOW_PER_WORKER = 4
+
+
+def get_concurrency():
+    try:
+        value = int(os.getenv("TMDB_CONCURRENCY", DEFAULT_CONCURRENCY))
+    except ValueError:
+        value = DEFAULT_CONCURRENCY
+    return max(1, value)
+
+
+def iter_fetch(fetch, ids, concurrency=None):
+    """Chiama fetch(id) per ogni id e produce coppie (id, risultato) in ordine."""
+    concurrency = concurrency or get_concurrency()
+
+    def safe_fetch(tmdb_id):
+        try:
+            return fetch(tmdb_id)
+        except Exception as e:
+            print(f"Errore TMDb {tmdb_id}: {e}", file=sys.stderr)
+            return None
+
+    if concurrency == 1:
+        for tmdb_id in ids:
+            yield tmdb_id, safe_fetch(tmdb_id)
+        return
+
+    window = concurrency * WINDOW_PER_WORKER
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = deque()
+        for tmdb_id in ids:
+            pending.append((tmdb_id, pool.submit(safe_fetch, tmdb_id)))
+            if len(pending) >= window:
+                done_id, future = pending.popleft()
+                yield done_id, future.result()
+        while pending:
+            done_id, future = pending.popleft()
+            yield done_id, future.result()
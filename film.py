@@ -5,18 +5,23 @@ Scarica lista da https://vixsrc.to/api/list/movie/?lang=It,
 risolve tmdb_id -> titolo e genera movies.html con link + iframe miniplayer
 """
 
+import os
 import requests
 from bs4 import BeautifulSoup
 import time
 import html
 
-SRC_URL = "https://vixsrc.to/api/list/movie/?lang=It"
-TMDB_URL_TEMPLATE = "https://www.themoviedb.org/movie/{}"
+# radici sovrascrivibili, ad esempio per il server di prova di benchmark.py
+VIXSRC_API_ROOT = os.getenv("VIXSRC_API_ROOT", "https://vixsrc.to/api").rstrip("/")
+TMDB_WEB_ROOT = os.getenv("TMDB_WEB_ROOT", "https://www.themoviedb.org").rstrip("/")
+SRC_URL = VIXSRC_API_ROOT + "/list/movie/?lang=It"
+TMDB_URL_TEMPLATE = TMDB_WEB_ROOT + "/movie/{}"
 VIX_PLAYER_TEMPLATE = "https://vixsrc.to/movie/{}/?"
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; script/1.0; +https://example.org)"
 }
 OUTPUT_HTML = "movies.html"
+DELAY = float(os.getenv("FILM_DELAY", "0.2"))  # pausa tra una pagina TMDb e l'altra
 
 def get_id_list():
     resp = requests.get(SRC_URL, headers=HEADERS, timeout=15)
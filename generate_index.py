@@ -7,93 +7,46 @@ Aggiunta gestione Preferiti con stellina e filtro multi-genere.
 - Stellina cliccabile dentro la card info
 - Possibilità di selezionare più generi
 - Correzione back button: chiude il player prima di tornare alla card o griglia
+- La prima pagina di film è già scritta nell'HTML: lo script adotta quelle card
+- Service worker (sw.js) per riaprire la pagina dalla cache alle visite successive
+- Stile e script in static/, pubblicati come file con l'hash nel nome (static_assets.py)
 """
 
+import argparse
+import json
 import os
-import sys
-import requests
+from html import escape
+
+import build_report
+from catalog_state import STATE_PATH, load_dataset, type_entries
+from data_shards import script_json, write_shards
+from posters import POSTER_DIR, POSTER_WIDTHS, build_sprite, lqip, pillow_available, poster_config, srcset
+from service_worker import SW_PATH, write_service_worker
+from static_assets import write_assets
 
 # --- Config ---
-SRC_URLS = {
-    "movie": "https://vixsrc.to/api/list/movie?lang=it",
-    "tv": "https://vixsrc.to/api/list/tv?lang=it"
-}
-TMDB_BASE = "https://api.themoviedb.org/3/{type}/{id}"
-TMDB_IMAGE_BASE = "https://image.tmdb.org/t/p/w300"
-VIX_LINK_MOVIE = "https://vixsrc.to/movie/{}/?"
 OUTPUT_HTML = "index.html"
-HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; script/1.0)"}
-
-def get_api_key():
-    key = os.getenv("TMDB_API_KEY")
-    if not key:
-        print("Errore: manca TMDB_API_KEY", file=sys.stderr)
-        sys.exit(1)
-    return key
-
-def fetch_list(url):
-    r = requests.get(url, headers=HEADERS, timeout=20)
-    r.raise_for_status()
-    return r.json()
-
-def extract_ids(data):
-    ids = []
-    items = data if isinstance(data, list) else data.get("results", [])
-    for item in items:
-        if not isinstance(item, dict):
-            continue
-        for key in ("tmdb_id", "tmdbId", "id"):
-            if key in item and item[key]:
-                ids.append(str(item[key]))
-                break
-    return ids
-
-def tmdb_get(api_key, type_, tmdb_id, language="it-IT"):
-    url = TMDB_BASE.format(type=type_, id=tmdb_id)
-    r = requests.get(
-        url,
-        params={"api_key": api_key, "language": language, "append_to_response": "credits"},
-        timeout=15
-    )
-    if r.status_code == 404:
-        return None
-    r.raise_for_status()
-    return r.json()
-
-def build_html(entries, latest_entries):
+GRID_MODE = os.getenv("GRID_MODE", "virtual")  # "paged" ripristina il pulsante "Carica altri"
+# "Ultime Novità": "sprite" = una sola immagine composta, "lqip" = anteprime in
+# base64 sostituite dopo il caricamento, "images" = un'immagine per locandina
+LATEST_STRIP = os.getenv("LATEST_STRIP", "sprite")
+SERVICE_WORKER = os.getenv("SERVICE_WORKER", "1") != "0"   # "0": niente sw.js, nessuna cache offline
+PRERENDER_HIGH = 4
+
+def build_html(manifest, assets, latest_entries, virtual=True, first_page=(), first_columns=None,
+               service_worker=True):
+    """assets: percorsi hashati di app.css e app.js (vedi static_assets.py);
+    first_page: voci della prima pagina di film, già scritte come card nell'HTML;
+    first_columns: la stessa pagina in formato colonnare, incorporata per lo script."""
+    load_more = "" if virtual else "<button id='loadMore'>Carica altri</button>"
+    prerendered = "".join(card_html(entry, pos) for pos, entry in enumerate(first_page))
     html = f"""<!doctype html>
 <html lang='it'>
 <head>
 <meta charset='utf-8'>
 <meta name='viewport' content='width=device-width,initial-scale=1'>
 <title>Movies & Series</title>
-<style>
-body{{font-family:Arial,sans-serif;background:#141414;color:#fff;margin:0;padding:20px;}}
-h1{{color:#fff;text-align:center;margin-bottom:20px;}}
-.controls{{display:flex;gap:10px;justify-content:center;margin-bottom:20px;flex-wrap:wrap;}}
-input,select{{padding:8px;font-size:14px;border-radius:4px;border:none;}}
-.grid{{display:grid;grid-template-columns:repeat(auto-fill,minmax(120px,1fr));gap:12px;}}
-.card{{position:relative;cursor:pointer;transition: transform 0.2s;border-radius:12px;overflow:hidden;border:2px solid #444;background:#1f1f1f;}}
-.card:hover{{transform:scale(1.05);border-color:#e50914;background:#2a2a2a;}}
-.poster{{width:100%;border-radius:0;display:block;}}
-.badge{{position:absolute;top:8px;right:8px;background:#e50914;color:#fff;padding:4px 6px;font-size:14px;font-weight:bold;border-radius:8px;text-align:center;}}
-.favorite-btn{{font-size:20px;color:#fff;text-shadow:0 0 4px #000;}}
-.favorite-btn.active{{color:gold;}}
-.card .favorite-btn{{position:absolute;top:8px;left:8px;pointer-events:none;}}
-#favoriteInCard.favorite-btn{{position:static;cursor:pointer;margin-left:auto;font-size:22px;}}
-#loadMore{{display:block;margin:20px auto;padding:10px 20px;font-size:16px;background:#e50914;color:#fff;border:none;border-radius:8px;cursor:pointer;}}
-#playerOverlay{{position:fixed;top:0;left:0;width:100%;height:100%;background:rgba(0,0,0,0.9);display:none;align-items:center;justify-content:center;z-index:1000;flex-direction:column;}}
-#playerOverlay iframe{{width:100%;height:100%;border:none;}}
-#infoCard{{position:fixed;top:0;left:0;width:100%;height:100%;background:rgba(34,34,34,0.85);display:none;z-index:1001;backdrop-filter:blur(8px);color:#fff;padding:20px;overflow:auto;}}
-#infoCard h2{{margin-top:0;color:#e50914;display:inline-block;}}
-#infoCard button#playBtn{{margin-left:10px;padding:8px 12px;background:#e50914;border:none;color:#fff;border-radius:5px;cursor:pointer;vertical-align:middle;}}
-#infoCard p{{margin:5px 0;}}
-#infoCard select{{margin:5px 5px 5px 0;padding:6px;}}
-#latest{{display:flex;overflow-x:auto;gap:10px;margin-bottom:20px;padding-bottom:10px;scroll-behavior: smooth;}}
-#latest::-webkit-scrollbar {{display: none;}}
-#latest {{-ms-overflow-style: none;scrollbar-width: none;}}
-#latest .poster{{width:100px;flex-shrink:0;}}
-</style>
+<link rel='stylesheet' href='{assets['app.css']}'>
 </head>
 <body>
 <h1>Ultime Novità</h1>
@@ -107,8 +60,10 @@ input,select{{padding:8px;font-size:14px;border-radius:4px;border:none;}}
 <select id='genreSelect' multiple size=5></select>
 <input type='text' id='searchBox' placeholder='Cerca...'>
 </div>
-<div id='moviesGrid' class='grid'></div>
-<button id='loadMore'>Carica altri</button>
+<div id='moviesGrid' class='grid'>
+{prerendered}
+</div>
+{load_more}
 
 <div id='playerOverlay'>
   <iframe allow="autoplay; fullscreen; encrypted-media" allowfullscreen></iframe>
@@ -133,299 +88,122 @@ input,select{{padding:8px;font-size:14px;border-radius:4px;border:none;}}
   </div>
 </div>
 
+<!-- configurazione della build; lo script (static/app.js) è in un file a parte -->
 <script>
-const allData = {entries};
-let favorites = JSON.parse(localStorage.getItem("favorites") || "[]");
-let currentItem = null;
-
-function toggleFavorite(id) {{
-  if(favorites.includes(id)) {{
-    favorites = favorites.filter(f=>f!==id);
-  }} else {{
-    favorites.push(id);
-  }}
-  localStorage.setItem("favorites", JSON.stringify(favorites));
-  render(true);
-}}
-
-const grid=document.getElementById('moviesGrid');
-const overlay=document.getElementById('playerOverlay');
-const iframe=overlay.querySelector('iframe');
-const infoCard=document.getElementById('infoCard');
-const infoTitle=document.getElementById('infoTitle');
-const infoGenres=document.getElementById('infoGenres');
-const infoVote=document.getElementById('infoVote');
-const infoOverview=document.getElementById('infoOverview');
-const playBtn=document.getElementById('playBtn');
-const closeCardBtn=document.getElementById('closeCardBtn');
-const latestDiv=document.getElementById('latest');
-const favoriteInCard=document.getElementById('favoriteInCard');
-const seasonSelect=document.getElementById('seasonSelect');
-const episodeSelect=document.getElementById('episodeSelect');
-const infoYear=document.getElementById('infoYear');
-const infoDuration=document.getElementById('infoDuration');
-const infoCast=document.getElementById('infoCast');
-
-closeCardBtn.onclick = () => {{
-  infoCard.style.display='none';
-  history.pushState({{page:"grid"}}, "", "#grid");
-}};
-
-function showLatest(){{
-    let scrollPos = 0;
-    function scroll() {{
-        scrollPos += 1;
-        if(scrollPos > latestDiv.scrollWidth - latestDiv.clientWidth) scrollPos = 0;
-        latestDiv.scrollTo({{ left: scrollPos, behavior: 'smooth' }});
-    }}
-    setInterval(scroll, 30);
-}}
-
-function openInfo(item, push=true) {{
-    currentItem = item;
-    infoCard.style.display='block';
-    infoCard.style.backgroundImage = "none";
-    infoCard.style.backgroundColor = "rgba(0,0,0,0.85)";
-    infoTitle.textContent = item.title;
-    infoGenres.textContent = "Generi: " + item.genres.join(", ");
-    infoVote.textContent = "★ " + item.vote;
-    infoOverview.textContent = item.overview || "";
-    infoYear.textContent = item.year ? "Anno: " + item.year : "";
-    infoDuration.textContent = item.duration ? "Durata: " + item.duration + " min" : "";
-    infoCast.textContent = item.cast && item.cast.length ? "Cast: " + item.cast.slice(0,5).join(", ") : "";
-
-    favoriteInCard.classList.toggle("active", favorites.includes(item.id));
-    favoriteInCard.onclick = () => {{
-        toggleFavorite(item.id);
-        favoriteInCard.classList.toggle("active", favorites.includes(item.id));
-    }};
-
-    seasonSelect.style.display = 'none';
-    episodeSelect.style.display = 'none';
-
-    if(item.type==='tv') {{
-        seasonSelect.style.display = 'inline';
-        episodeSelect.style.display = 'inline';
-        seasonSelect.innerHTML = "";
-        for(let s=1;s<=item.seasons;s++) {{
-            let o = document.createElement('option');
-            o.value = s;
-            o.textContent = "Stagione " + s;
-            seasonSelect.appendChild(o);
-        }}
-        seasonSelect.onchange = updateEpisodes;
-        updateEpisodes();
-    }}
-
-    playBtn.onclick = () => openPlayer(item);
-
-    if(push) {{
-        history.pushState({{page:"info", itemId:item.id}}, "", "#info-"+item.id);
-    }}
-
-    function updateEpisodes() {{
-        let season = parseInt(seasonSelect.value);
-        let epCount = item.episodes[season] || 1;
-        episodeSelect.innerHTML = "";
-        for(let e=1;e<=epCount;e++) {{
-            let o = document.createElement('option');
-            o.value = e;
-            o.textContent = "Episodio " + e;
-            episodeSelect.appendChild(o);
-        }}
-    }}
-}}
-
-function openPlayer(item, push=true) {{
-    infoCard.style.display = 'none';
-    overlay.style.display='flex';
-    let link = item.link;
-    if(item.type==='tv') {{
-        let season = parseInt(seasonSelect.value) || 1;
-        let episode = parseInt(episodeSelect.value) || 1;
-        link = `https://vixsrc.to/tv/${{item.id}}/${{season}}/${{episode}}?lang=it&sottotitoli=off&autoplay=1`;
-    }} else {{
-        link = `https://vixsrc.to/movie/${{item.id}}/?lang=it&sottotitoli=off&autoplay=1`;
-    }}
-    iframe.src = link;
-    if (overlay.requestFullscreen) overlay.requestFullscreen();
-    else if (overlay.webkitRequestFullscreen) overlay.webkitRequestFullscreen();
-    else if (overlay.msRequestFullscreen) overlay.msRequestFullscreen();
-
-    if(push) {{
-        history.pushState({{page:"player", itemId:item.id}}, "", "#player-"+item.id);
-    }}
-}}
-
-function closePlayer(push=true) {{
-    overlay.style.display='none';
-    iframe.src='';
-    if (document.fullscreenElement) document.exitFullscreen();
-    else if (document.webkitFullscreenElement) document.webkitExitFullscreen();
-    else if (document.msFullscreenElement) document.msExitFullscreen();
-
-    if(currentItem) {{
-        infoCard.style.display = 'block';
-        if(push) {{
-            history.pushState({{page:"info", itemId:currentItem.id}}, "", "#info-"+currentItem.id);
-        }}
-    }}
-}}
-
-/* Gestione popstate corretta */
-window.addEventListener("popstate", function(e) {{
-    const state = e.state;
-
-    if(!state || state.page==="grid" || state.page==="home") {{
-        overlay.style.display='none';
-        iframe.src='';
-        infoCard.style.display='none';
-        return;
-    }}
-
-    const itemId = state.itemId;
-    const item = allData.find(x => String(x.id) === String(itemId));
-    if(!item) {{
-        overlay.style.display='none';
-        iframe.src='';
-        infoCard.style.display='none';
-        return;
-    }}
-
-    if(state.page === "player") {{
-        openPlayer(item, false);
-    }} else if(state.page === "info") {{
-        if(overlay.style.display==='flex') {{
-            closePlayer(false); // prima chiudi il player se è aperto
-        }}
-        openInfo(item, false);
-    }} else {{
-        overlay.style.display='none';
-        iframe.src='';
-        infoCard.style.display='none';
-    }}
-}});
-
-let currentType='movie', currentList=[], shown=0;
-
-function render(reset=false) {{
-    if(reset){{ grid.innerHTML=''; shown=0; }}
-    let count=0;
-    let s = document.getElementById('searchBox').value.toLowerCase();
-    let gSel = Array.from(document.getElementById('genreSelect').selectedOptions).map(o=>o.value);
-    while(shown<currentList.length && count<40) {{
-        let m = currentList[shown++];
-        let isFav = favorites.includes(m.id);
-        let genreMatch = 
-    gSel.length===0 
-    || gSel.includes('all') 
-    || (gSel.includes('favorites') && isFav) 
-    || gSel.every(g => m.genres.includes(g));
-        if(genreMatch && m.title.toLowerCase().includes(s)) {{
-            const card = document.createElement('div');
-            card.className='card';
-            card.innerHTML = `
-                <img class='poster' src='${{m.poster}}' alt='${{m.title}}'>
-                <div class='badge'>${{m.vote}}</div>
-                <p style="margin:2px 0;font-size:12px;color:#ccc;">
-                    ${{m.duration ? m.duration + ' min • ' : ''}}${{m.year ? m.year : ''}}
-                </p>
-                <span class="favorite-btn ${{isFav ? 'active' : ''}}" style="pointer-events:none;">★</span>
-            `;
-            card.onclick = () => openInfo(m);
-            grid.appendChild(card);
-            count++;
-        }}
-    }}
-}}
-
-function populateGenres(){{
-    const set=new Set();
-    currentList.forEach(m=>m.genres.forEach(g=>set.add(g)));
-    const sel=document.getElementById('genreSelect');
-    sel.innerHTML='<option value="all">Tutti i generi</option><option value="favorites">★ Preferiti</option>';
-    [...set].sort().forEach(g=>{{
-        const o=document.createElement('option');
-        o.value=o.textContent=g;
-        sel.appendChild(o);
-    }});
-}}
-
-function updateType(t){{
-    currentType=t;
-    currentList=allData.filter(x=>x.type===t);
-    populateGenres();
-    render(true);
-}}
-
-/* Eventi UI */
-document.getElementById('typeSelect').onchange=e=>updateType(e.target.value);
-document.getElementById('genreSelect').onchange=()=>render(true);
-document.getElementById('searchBox').oninput=()=>render(true);
-document.getElementById('loadMore').onclick=()=>render(false);
-
-/* stato iniziale nella history */
-history.replaceState({{page:"grid"}}, "", "#grid");
-
-updateType('movie');
-showLatest();
+const catalog = {script_json(manifest)};
+const VIRTUAL_GRID = {'true' if virtual else 'false'};
+const SERVICE_WORKER = {'true' if service_worker else 'false'};
+const FIRST_PAGE = {script_json(first_columns or {})}; // prima pagina di film, già nelle card dell'HTML
+const SW_URL = {script_json(SW_PATH)};
 </script>
+<script src='{assets['app.js']}' defer></script>
 </body>
 </html>
 """
     return html
 
-def main():
-    api_key = get_api_key()
-    entries = []
-    latest_entries = ""
-
-    for type_, url in SRC_URLS.items():
-        data = fetch_list(url)
-        ids = extract_ids(data)
-
-        for idx, tmdb_id in enumerate(ids):
-            try:
-                info = tmdb_get(api_key, type_, tmdb_id)
-            except:
-                info = None
-            if not info:
-                continue
-
-            title = info.get("title") or info.get("name") or f"ID {tmdb_id}"
-            poster = TMDB_IMAGE_BASE + info["poster_path"] if info.get("poster_path") else ""
-            genres = [g["name"] for g in info.get("genres", [])]
-            vote = info.get("vote_average", 0)
-            overview = info.get("overview", "")
-            link = VIX_LINK_MOVIE.format(tmdb_id) if type_=="movie" else ""
-            seasons = info.get("number_of_seasons", 1) if type_=="tv" else 0
-            episodes = {str(s["season_number"]): s.get("episode_count", 1) for s in info.get("seasons", []) if s.get("season_number")} if type_=="tv" else {}
-            duration = info.get("runtime", 0) if type_=="movie" else 0
-            year = (info.get("release_date") or info.get("first_air_date") or "")[:4]
-            cast = [c["name"] for c in info.get("credits", {}).get("cast", [])] if info.get("credits") else []
+def js_number(value):
+    """Come JavaScript mostra un numero (7.0 -> "7")."""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def card_html(entry, pos):
+    """Card statica identica a quella di createCard()/fillCard() nello script."""
+    # la larghezza della griglia non si conosce qui: priorità alta alle prime PRERENDER_HIGH card
+    hints = "loading='eager' fetchpriority='high'" if pos < PRERENDER_HIGH else "loading='lazy'"
+    if entry.thumb:
+        poster = (f"srcset='{srcset(entry.thumb)}' sizes='160px' "
+                  f"src='{POSTER_DIR}/{entry.thumb}-{POSTER_WIDTHS[-1]}.webp'")
+    else:
+        poster = f"src='{escape(entry.poster)}'"
+    meta = (f"{entry.duration} min • " if entry.duration else "") + (entry.year or "")
+    return (f"<div class='card' data-pos='{pos}'>"
+            f"<img class='poster' alt='{escape(entry.title)}' width='160' height='240' decoding='async' {hints} {poster}>"
+            f"<div class='badge'>{js_number(entry.vote)}</div>"
+            f"<p class='meta' style=\"margin:2px 0;font-size:12px;color:#ccc;\">{escape(meta)}</p>"
+            f"<span class=\"favorite-btn\" style=\"pointer-events:none;\">★</span></div>\n")
+
+def latest_poster(entry, mode="images"):
+    """Locandina della striscia "Ultime Novità", larga 100 px."""
+    css = "poster"
+    if entry.thumb and mode == "lqip":
+        css += " lqip"
+        attrs = f"src='{lqip(entry.thumb)}' data-srcset='{srcset(entry.thumb)}'"
+    elif entry.thumb:
+        src = f"{POSTER_DIR}/{entry.thumb}-{POSTER_WIDTHS[0]}.webp"
+        attrs = f"src='{src}' srcset='{srcset(entry.thumb)}' sizes='100px'"
+    else:
+        attrs = f"src='{escape(entry.poster)}'"
+    title = escape(entry.title)
+    return f"<img class='{css}' {attrs} alt='{title}' title='{title}'>\n"
+
+def latest_strip(entries, mode=LATEST_STRIP):
+    if mode not in ("sprite", "lqip") or not pillow_available():
+        mode = "images"
+    if mode != "sprite":
+        return "".join(latest_poster(entry, mode) for entry in entries)
+    tiled = [entry for entry in entries if entry.thumb]
+    sheet = build_sprite([entry.thumb for entry in tiled]) if tiled else ""
+    html = ""
+    for entry in entries:
+        if entry not in tiled:
+            html += latest_poster(entry)
+            continue
+        x = -100 * tiled.index(entry)
+        style = f"background:url({POSTER_DIR}/{sheet}) {x}px 0/{len(tiled) * 100}px 150px"
+        title = escape(entry.title)
+        html += (f"<div class='poster sprite' role='img' aria-label='{title}' "
+                 f"title='{title}' style='{style}'></div>\n")
+    return html
 
-            entries.append({
-                "id": tmdb_id,
-                "title": title,
-                "poster": poster,
-                "genres": genres,
-                "vote": vote,
-                "overview": overview,
-                "link": link,
-                "type": type_,
-                "seasons": seasons,
-                "episodes": episodes,
-                "duration": duration or 0,
-                "year": year or "",
-            "cast": cast
-            })
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Genera index.html dal dataset del catalogo (vedi ingest.py)")
+    parser.add_argument("--dataset", default=STATE_PATH, help=f"percorso del dataset (default {STATE_PATH})")
+    build_report.add_arguments(parser)
+    return parser.parse_args(argv)
 
-            if idx < 10:
-                latest_entries += f"<img class='poster' src='{poster}' alt='{title}' title='{title}'>\n"
+def main():
+    args = parse_args()
+    with build_report.session("generate_index", args.report, args.profile):
+        generate(args.dataset)
 
-    html = build_html(entries, latest_entries)
-    with open(OUTPUT_HTML, "w", encoding="utf-8") as f:
-        f.write(html)
+def generate(path):
+    with build_report.stage("load"):
+        dataset = load_dataset(path)
+    entries = []
+    latest = []
+
+    with build_report.stage("transform"):
+        for type_ in dataset["types"]:
+            ids, records = type_entries(dataset, type_)
+            for idx, tmdb_id in enumerate(ids):
+                entry = records.get(tmdb_id)
+                if not entry:
+                    continue
+                entries.append(entry)
+
+                if idx < 10:
+                    latest.append(entry)
+
+    with build_report.stage("shards"):
+        manifest = write_shards(entries)
+    manifest["posters"] = poster_config()
+    with build_report.stage("html_build"):
+        first_page, first_columns = [], None
+        movie_pages = manifest["types"].get("movie", {}).get("pages", [])
+        if movie_pages:
+            first_page = [entry for entry in entries if entry.type == "movie"][:manifest["pageSize"]]
+            with open(os.path.join(manifest["dir"], movie_pages[0]), encoding="utf-8") as f:
+                first_columns = json.load(f)
+        assets = write_assets()
+        html = build_html(manifest, assets, latest_strip(latest), GRID_MODE != "paged", first_page,
+                          first_columns, SERVICE_WORKER)
+    with build_report.stage("write"):
+        with open(OUTPUT_HTML, "w", encoding="utf-8") as f:
+            f.write(html)
+        if SERVICE_WORKER:
+            write_service_worker(manifest, html, [OUTPUT_HTML], list(assets.values()),
+                                 [entry.thumb for entry in entries if entry.thumb])
+    build_report.count("entries", len(entries))
     print(f"Generato {OUTPUT_HTML} con {len(entries)} elementi e ultime novità scrollabili")
 
 if __name__ == "__main__":
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+ingest.py
+
+Scarica il catalogo una sola volta e lo salva nel dataset condiviso
+(catalog.json, vedi catalog_state.py) da cui generate_index.py,
+generate_movies_page.py e tvmov.py costruiscono le pagine senza rete.
+- Liste vixsrc di film e serie, dettagli TMDb in italiano con il cast
+- Con --incremental scarica solo gli ID nuovi più una fetta di record vecchi;
+  senza, riscarica tutto (la cache TMDb evita comunque le richieste ripetute)
+- Con --changes riscarica, oltre agli ID nuovi, solo quelli comparsi nei feed
+  /movie/changes e /tv/changes dall'ultima esecuzione con --changes; se è
+  passato più della finestra del feed (14 giorni) si torna alla rotazione;
+  --save-changes FILE scarica solo il feed e lo salva, --changes-file FILE lo
+  riusa (così gli shard non riscaricano ognuno il feed intero)
+- Le liste vixsrc si scaricano con GET condizionale; con --incremental o
+  --changes, se le liste sono invariate e nessun titolo è da aggiornare il
+  dataset non viene riscritto e l'esito (changed=false) finisce in
+  GITHUB_OUTPUT, così il workflow salta la generazione e il commit
+- Con --tv-episodes aggiunge alle serie gli episodi di ogni stagione, a gruppi
+  di 20 stagioni per chiamata; le stagioni con data e numero di episodi uguali
+  a quelli del dataset precedente non vengono riscaricate
+- Ogni voce scaricata finisce subito nel journal di ripresa (vedi
+  catalog_state.py): se la build si interrompe, la successiva salta gli ID già
+  scaricati; a dataset salvato il journal si cancella
+- Con --shard i/N scarica solo gli ID dello shard i (vedi catalog_state.py),
+  con 1/N di TMDB_RATE, e scrive un dataset parziale accanto a --output;
+  merge_shards.py ricompone il dataset completo dai parziali di tutti gli shard
+- Se resta senza dettagli più di INGEST_MAX_DROP_RATE degli ID in lista
+  (default 0.1) il dataset viene salvato ma lo script esce con errore
+- Con --report scrive tempi delle fasi, latenze, 429, cache e ID scartati in
+  un report JSON (vedi build_report.py); --profile salva il profilo cProfile
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import build_report
+from catalog_state import (STATE_PATH, Journal, diff_ids, in_shard, journal_path, load_state, merge_records,
+                           parse_shard, partial_state, plan_changes, plan_fetch, read_journal, save_state, shard_path)
+from entries import Entry, season_episodes, season_unchanged
+from fetch_engine import iter_fetch
+from tmdb_cache import open_cache
+from tmdb_client import SRC_URLS, TMDbClient, get_api_key
+
+LANGUAGE = "it-IT"
+APPEND = "credits"
+CHANGES_WINDOW = 14 * 86400   # il feed /changes copre al massimo 14 giorni
+try:
+    MAX_DROP_RATE = float(os.getenv("INGEST_MAX_DROP_RATE", "0.1"))
+except ValueError:
+    MAX_DROP_RATE = 0.1
+
+
+def enrich_seasons(client, tmdb_id, info, cached, refresh=False):
+    """Episodi per stagione, riusando quelli salvati delle stagioni non cambiate."""
+    seasons = [s for s in info.get("seasons", []) if s.get("season_number")]
+    episode_info, changed = {}, []
+    for season in seasons:
+        key = str(season["season_number"])
+        if season_unchanged(cached.get(key), season):
+            episode_info[key] = cached[key]
+        else:
+            changed.append(season["season_number"])
+    fetched = client.seasons(tmdb_id, changed, LANGUAGE, refresh=refresh or bool(cached))
+    for number, season in fetched.items():
+        episode_info[str(number)] = season_episodes(season)
+    return dict(sorted(episode_info.items(), key=lambda item: int(item[0])))
+
+
+def fetch_entries(client, type_, ids, refresh=False, records=None, episodes=False, failures=None,
+                  journal=None):
+    """Dict id -> record dell'Entry (None se la richiesta non è andata a buon fine).
+
+    In `failures` finisce il motivo di ogni richiesta fallita; con `journal`
+    ogni record scaricato vi viene aggiunto appena arriva.
+    """
+    records = records or {}
+    failures = {} if failures is None else failures
+
+    def fetch(tmdb_id):
+        try:
+            info = client.details(type_, tmdb_id, language=LANGUAGE, append=APPEND, refresh=refresh)
+        except Exception as e:
+            failures[tmdb_id] = f"errore {type(e).__name__}"
+            raise
+        if not info:
+            failures[tmdb_id] = "non trovato su TMDb"
+            return None
+        entry = Entry.from_tmdb(type_, tmdb_id, info)
+        if episodes and type_ == "tv":
+            cached = records.get(tmdb_id, {}).get("entry", {}).get("episode_info") or {}
+            entry.episode_info = enrich_seasons(client, tmdb_id, info, cached, refresh)
+        return entry.to_dict()
+
+    fetched = {}
+    for tmdb_id, entry in iter_fetch(fetch, list(dict.fromkeys(ids))):
+        fetched[tmdb_id] = entry
+        if journal is not None and entry is not None:
+            journal.append(type_, tmdb_id, entry)
+    return fetched
+
+
+def changes_window(state, now):
+    """Date (inizio, fine) del feed /changes, o None se serve la rotazione."""
+    since = state.get("changes_since")
+    if not since or now - since > CHANGES_WINDOW:
+        return None
+    return time.strftime("%Y-%m-%d", time.gmtime(since)), time.strftime("%Y-%m-%d", time.gmtime(now))
+
+
+def fetch_changes(client, state, now):
+    """{tipo: ID cambiati, o None se il feed è incompleto}; None se serve la rotazione."""
+    window = changes_window(state, now)
+    if window is None:
+        print("Feed changes non utilizzabile (prima esecuzione o oltre 14 giorni): uso la rotazione")
+        return None
+    with build_report.stage("changes_fetch"):
+        return {type_: client.changes(type_, *window) for type_ in SRC_URLS}
+
+
+def save_changes(path, started, feed):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"started": started,
+                   "types": None if feed is None else
+                   {type_: None if ids is None else sorted(ids) for type_, ids in feed.items()}}, f)
+
+
+def load_changes(path):
+    """(istante del download, feed come da fetch_changes()) da un file di save_changes()."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    feed = data["types"]
+    return data["started"], None if feed is None else {
+        type_: None if ids is None else set(ids) for type_, ids in feed.items()}
+
+
+def plan_type(type_, ids, type_state, incremental=True, episodes=False, changed=None):
+    """(mancanti, da aggiornare) per un tipo; i mancanti includono le serie da arricchire."""
+    records = type_state.get("records", {})
+    if changed is not None:
+        missing, stale = plan_changes(type_state, ids, changed)
+    elif incremental:
+        missing, stale = plan_fetch(type_state, ids)
+    else:
+        missing, stale = list(dict.fromkeys(ids)), []
+    if episodes and type_ == "tv":
+        # serie già nel dataset ma mai arricchite: i dettagli arrivano dalla cache
+        skip = set(missing) | set(stale)
+        missing += [i for i in dict.fromkeys(ids) if i in records and i not in skip
+                    and not records[i]["entry"].get("episode_info")]
+    return missing, stale
+
+
+def ingest_type(client, type_, ids, type_state, missing, stale, incremental=True, episodes=False,
+                changed=None, journal=None, resumed=None):
+    """`resumed`: record già scaricati da una build interrotta (dal journal), da non richiedere."""
+    added, removed = diff_ids(type_state.get("ids", []), ids)
+    previous = type_state.get("records", {})
+    if not incremental:
+        type_state["records"] = {}
+    resumed = resumed or {}
+    missing = [i for i in missing if i not in resumed]
+    stale = [i for i in stale if i not in resumed]
+    failures = {}
+    with build_report.stage("detail_fetch"):
+        fetched = fetch_entries(client, type_, missing, records=previous, episodes=episodes, failures=failures,
+                                journal=journal)
+        fetched.update(fetch_entries(client, type_, stale, refresh=True, records=previous, episodes=episodes,
+                                     failures=failures, journal=journal))
+    current = set(ids)
+    fetched.update((i, entry) for i, entry in resumed.items() if i in current)
+    with build_report.stage("transform"):
+        records = merge_records(type_state, ids, fetched)
+    for tmdb_id in dict.fromkeys(ids):
+        if tmdb_id not in records:
+            build_report.drop(type_, tmdb_id, failures.get(tmdb_id, "nessun dettaglio"))
+    build_report.count(f"{type_}.fetched", len(fetched))
+    if changed is not None:
+        type_state["pending"] = [i for i in stale if fetched.get(i) is None]
+    print(f"{type_}: +{len(added)} -{len(removed)}, {len(missing)} da scaricare e {len(stale)} da aggiornare")
+    return records
+
+
+def report_changed(changed):
+    """Espone l'esito ai passi successivi del workflow GitHub Actions."""
+    output = os.getenv("GITHUB_OUTPUT")
+    if output:
+        with open(output, "a", encoding="utf-8") as f:
+            f.write(f"changed={'true' if changed else 'false'}\n")
+
+
+def is_quiet(type_state, list_changed, missing, stale):
+    """Lista invariata e niente da aggiornare: i mancanti senza record sono ID già falliti."""
+    records = type_state.get("records", {})
+    return not list_changed and not stale and all(i not in records for i in missing)
+
+
+def ingest(incremental=True, path=STATE_PATH, episodes=False, changes=False, shard=None, feed=None):
+    """Aggiorna il dataset; restituisce None se non c'era niente da aggiornare.
+
+    Con `shard` (i, N) il dataset in `path` fa solo da punto di partenza e viene
+    scritto (sempre) il dataset parziale dello shard in shard_path(path, shard).
+    `feed` (istante, feed) da load_changes() sostituisce il download del feed
+    changes. Esce con errore, a dataset salvato, se troppi ID restano senza
+    dettagli.
+    """
+    client = TMDbClient(get_api_key(), cache=open_cache(), rate_share=shard[1] if shard else 1)
+    journal_file = shard_path(journal_path(path), shard) if shard else journal_path(path)
+    # anche senza --incremental il dataset precedente serve a riusare gli episodi
+    with build_report.stage("load"):
+        state = load_state(path)
+        resumed = read_journal(journal_file)
+    if resumed:
+        build_report.count("journal.resumed", sum(map(len, resumed.values())))
+        print(f"Ripresa di una build interrotta: {sum(map(len, resumed.values()))} voci già scaricate nel journal")
+    incremental = incremental or changes
+    if feed is not None:
+        started, changed_ids = feed
+    else:
+        started = time.time()
+        changed_ids = fetch_changes(client, state, started) if changes else None
+    complete = True
+    listed_count = dropped = 0
+    plans, listed = {}, {}
+    journal = None
+    try:
+        for type_, url in SRC_URLS.items():
+            type_state = state["types"].setdefault(type_, {})
+            with build_report.stage("list_fetch"):
+                fetched_ids, type_state["source"] = client.fetch_list(url, type_state.get("source"))
+                ids = fetched_ids if fetched_ids is not None else type_state.get("ids", [])
+            listed[type_] = ids
+            if shard:
+                ids = [i for i in ids if in_shard(i, shard)]
+                type_state["ids"] = [i for i in type_state.get("ids", []) if in_shard(i, shard)]
+            changed = changed_ids.get(type_) if changed_ids is not None else None
+            if changed_ids is not None and changed is None:
+                # la finestra non avanza: il prossimo giro rilegge anche questi giorni
+                complete = False
+                print(f"{type_}: feed changes incompleto, uso la rotazione")
+            missing, stale = plan_type(type_, ids, type_state, incremental, episodes, changed)
+            plans[type_] = (ids, missing, stale, changed, fetched_ids is not None)
+
+        quiet = incremental and complete and not resumed and all(
+            is_quiet(state["types"][type_], list_changed, missing, stale)
+            for type_, (_, missing, stale, _, list_changed) in plans.items())
+        if quiet and not shard:
+            return None
+
+        if not quiet:
+            # uno shard invariato scrive comunque il suo parziale, che serve a merge_shards.py
+            journal = Journal(journal_file)
+            for type_, (ids, missing, stale, changed, _) in plans.items():
+                records = ingest_type(client, type_, ids, state["types"][type_], missing, stale, incremental,
+                                      episodes, changed, journal, resumed.get(type_))
+                unique = set(ids)
+                listed_count += len(unique)
+                dropped += len(unique.difference(records))
+    finally:
+        client.close()
+        if journal is not None:
+            journal.close()
+    if changes and complete:
+        # anche uno shard invariato ha letto il feed fino a `started`: merge_shards() prende il minimo
+        state["changes_since"] = started
+    with build_report.stage("write"):
+        if shard:
+            state = partial_state(state, shard, listed, not quiet)
+            save_state(state, shard_path(path, shard))
+        else:
+            save_state(state, path)
+        if journal is not None:
+            journal.discard()
+    if listed_count and dropped > MAX_DROP_RATE * listed_count:
+        sys.exit(f"Errore: {dropped} di {listed_count} titoli senza dettagli TMDb"
+                 f" (oltre INGEST_MAX_DROP_RATE={MAX_DROP_RATE})")
+    return state
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scarica il catalogo vixsrc + TMDb nel dataset condiviso")
+    parser.add_argument("--incremental", action="store_true",
+                        help="scarica da TMDb solo gli ID nuovi rispetto al dataset esistente")
+    parser.add_argument("--changes", action="store_true",
+                        help="come --incremental, ma aggiorna solo i titoli cambiati su TMDb dall'ultima volta")
+    parser.add_argument("--changes-file", metavar="FILE",
+                        help="come --changes, ma con il feed salvato da --save-changes invece di scaricarlo")
+    parser.add_argument("--save-changes", metavar="FILE",
+                        help="scarica solo il feed changes per il dataset di --output e lo salva in FILE")
+    parser.add_argument("--tv-episodes", action="store_true",
+                        help="aggiunge alle serie titolo, data e immagine di ogni episodio")
+    parser.add_argument("--output", default=STATE_PATH, help=f"percorso del dataset (default {STATE_PATH})")
+    parser.add_argument("--shard", type=parse_shard, metavar="I/N",
+                        help="scarica solo gli ID dello shard I di N e scrive un dataset parziale")
+    build_report.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    if args.save_changes:
+        client = TMDbClient(get_api_key())
+        try:
+            started = time.time()
+            save_changes(args.save_changes, started, fetch_changes(client, load_state(args.output), started))
+        finally:
+            client.close()
+        print(f"Salvato il feed changes in {args.save_changes}")
+        return
+    feed = load_changes(args.changes_file) if args.changes_file else None
+    with build_report.session("ingest", args.report, args.profile):
+        state = ingest(args.incremental, args.output, args.tv_episodes, args.changes or feed is not None,
+                       args.shard, feed)
+        if not args.shard:
+            # con gli shard l'esito complessivo lo scrive merge_shards.py
+            report_changed(state is not None)
+        if state is None:
+            print("Liste vixsrc invariate e nessun titolo da aggiornare: niente da fare")
+            return
+        total = sum(len(t.get("records", {})) for t in state["types"].values())
+        output = shard_path(args.output, args.shard) if args.shard else args.output
+        print(f"Salvato {output} con {total} elementi")
+
+
+if __name__ == "__main__":
+    main()
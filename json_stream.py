@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+json_stream.py
+
+Lettura e scrittura di JSON e HTML a pezzi, senza tenere in memoria l'intero
+documento.
+- iter_array(): elementi di un array JSON man mano che arrivano i blocchi della
+  risposta (liste vixsrc); con un oggetto {"results": [...]} si ripiega sul
+  parsing completo
+- iter_columns(): il formato colonnare di entries.columns(), un campo alla
+  volta e a gruppi di valori
+- write_stream(): scrive su disco i pezzi prodotti da un generatore e
+  sostituisce il file solo a scrittura finita
+"""
+
+import codecs
+import json
+import os
+
+CHUNK_SIZE = 64 * 1024
+VALUE_BATCH = 500   # valori serializzati per pezzo in iter_columns()
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+_SEPARATORS = _WHITESPACE + ","
+
+
+def iter_array(chunks):
+    """Elementi dell'array JSON contenuto nei blocchi (bytes o str) di `chunks`."""
+    decode = codecs.getincrementaldecoder("utf-8")().decode   # caratteri divisi tra due blocchi
+    buf, pos, started = "", 0, False
+    chunks = iter(chunks)
+    for chunk in chunks:
+        buf = buf[pos:] + (decode(chunk) if isinstance(chunk, bytes) else chunk)
+        pos = 0
+        if not started:
+            buf = buf.lstrip(_WHITESPACE + "\ufeff")
+            if not buf:
+                continue
+            if buf[0] != "[":
+                # non è un array (ad es. {"results": [...]}): serve il documento intero
+                rest = "".join(decode(c) if isinstance(c, bytes) else c for c in chunks) + decode(b"", True)
+                data = json.loads(buf + rest)
+                yield from (data.get("results", []) if isinstance(data, dict) else [])
+                return
+            pos, started = 1, True
+        while True:
+            while pos < len(buf) and buf[pos] in _SEPARATORS:
+                pos += 1
+            if pos >= len(buf) or buf[pos] == "]":
+                break
+            try:
+                item, end = _decoder.raw_decode(buf, pos)
+            except ValueError:
+                break   # elemento incompleto: si aspetta il blocco successivo
+            if (isinstance(item, (int, float)) and not isinstance(item, bool)
+                    and (end == len(buf) or buf[end] not in _SEPARATORS + "]")):
+                break   # numero che potrebbe continuare nel blocco successivo ("15" di "1500.0")
+            yield item
+            pos = end
+    tail = buf[pos:].strip(_SEPARATORS)
+    if tail != "]" and started:
+        # l'ultimo numero, rimasto in attesa di un blocco successivo
+        item, end = _decoder.raw_decode(tail)
+        tail = tail[end:].strip(_SEPARATORS)
+        yield item
+    if tail != "]":
+        raise ValueError("array JSON troncato")
+
+
+def iter_columns(entries, fields, genre_ids=None, escape_script=False):
+    """Pezzi del JSON colonnare {campo: [valori]} (come entries.columns(), senza drop_empty).
+
+    Con escape_script il testo è sicuro dentro un tag <script> (come data_shards.script_json).
+    """
+    yield "{"
+    for n, name in enumerate(fields):
+        yield ("," if n else "") + json.dumps(name) + ":["
+        for start in range(0, len(entries), VALUE_BATCH):
+            values = []
+            for entry in entries[start:start + VALUE_BATCH]:
+                value = getattr(entry, name)
+                if name == "genres" and genre_ids is not None:
+                    value = [genre_ids[g] for g in value]
+                values.append(json.dumps(value, ensure_ascii=False))
+            text = ("," if start else "") + ",".join(values)
+            yield text.replace("</", "<\\/") if escape_script else text
+        yield "]"
+    yield "}"
+
+
+def write_stream(path, parts):
+    """Scrive i pezzi di testo in path (tramite un file temporaneo) e restituisce i caratteri scritti."""
+    tmp = path + ".tmp"
+    written = 0
+    with open(tmp, "w", encoding="utf-8") as f:
+        for part in parts:
+            f.write(part)
+            written += len(part)
+    os.replace(tmp, path)
+    return written
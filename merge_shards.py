@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+merge_shards.py
+
+Ricompone catalog.json dai dataset parziali scritti da `ingest.py --shard i/N`
+(vedi catalog_state.py), dopo di che i generatori lavorano come sempre.
+- I parziali si passano come argomenti, oppure si cercano accanto a --output
+  (catalog.shard-*-of-N.json); devono esserci tutti gli shard da 1 a N
+- Il risultato non dipende dall'ordine dei file né da quale shard ha finito
+  prima; a dataset salvato i parziali vengono cancellati
+- L'esito (changed=true se almeno uno shard ha aggiornato qualcosa) finisce in
+  GITHUB_OUTPUT come per ingest.py
+- Con --local N esegue prima gli N shard come processi in parallelo su questa
+  macchina; gli argomenti non riconosciuti (ad esempio --changes) passano a
+  ingest.py. Con --changes il feed changes si scarica una volta sola e gli
+  shard lo leggono con --changes-file
+"""
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+
+import build_report
+from catalog_state import STATE_PATH, merge_shards, save_state, shard_path
+from ingest import report_changed
+
+# --- Config ---
+INGEST_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingest.py")
+
+
+def find_partials(output, count=None):
+    stem, ext = os.path.splitext(output)
+    return sorted(glob.glob(f"{glob.escape(stem)}.shard-*-of-{count or '*'}{ext}"))
+
+
+def run_local(count, output, ingest_args):
+    """Esegue gli shard 1..count di ingest.py in parallelo; esce se uno fallisce."""
+    feed_file = None
+    if "--changes" in ingest_args:
+        feed_file = os.path.splitext(output)[0] + ".changes.json"
+        if subprocess.call([sys.executable, INGEST_SCRIPT, "--save-changes", feed_file, "--output", output]) != 0:
+            sys.exit("Errore: download del feed changes non riuscito")
+        ingest_args = [arg for arg in ingest_args if arg != "--changes"] + ["--changes-file", feed_file]
+    try:
+        procs = [subprocess.Popen([sys.executable, INGEST_SCRIPT, "--shard", f"{i}/{count}", "--output", output]
+                                  + ingest_args) for i in range(1, count + 1)]
+        failed = [i for i, proc in enumerate(procs, 1) if proc.wait() != 0]
+    finally:
+        if feed_file and os.path.exists(feed_file):
+            os.remove(feed_file)
+    if failed:
+        sys.exit(f"Errore: shard non riusciti: {', '.join(map(str, failed))}")
+    return [shard_path(output, (i, count)) for i in range(1, count + 1)]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ricompone il dataset del catalogo dai parziali degli shard")
+    parser.add_argument("partials", nargs="*", help="dataset parziali (default: quelli accanto a --output)")
+    parser.add_argument("--output", default=STATE_PATH, help=f"percorso del dataset (default {STATE_PATH})")
+    parser.add_argument("--shards", type=int, help="numero di shard atteso")
+    parser.add_argument("--local", type=int, metavar="N", help="esegue prima N shard di ingest.py in parallelo")
+    build_report.add_arguments(parser)
+    return parser.parse_known_args(argv)
+
+
+def main():
+    args, ingest_args = parse_args()
+    if args.local:
+        paths = run_local(args.local, args.output, ingest_args)
+    elif ingest_args:
+        sys.exit(f"Errore: argomenti sconosciuti {' '.join(ingest_args)}")
+    else:
+        paths = args.partials or find_partials(args.output, args.shards)
+    with build_report.session("merge_shards", args.report, args.profile):
+        with build_report.stage("load"):
+            partials = []
+            for path in paths:
+                with open(path, encoding="utf-8") as f:
+                    partials.append(json.load(f))
+        with build_report.stage("merge"):
+            try:
+                state, changed = merge_shards(partials)
+            except ValueError as e:
+                sys.exit(f"Errore: {e}")
+            if args.shards and len(partials) != args.shards:
+                sys.exit(f"Errore: attesi {args.shards} shard, trovati {len(partials)}")
+        with build_report.stage("write"):
+            save_state(state, args.output)
+            for path in paths:
+                os.remove(path)
+        report_changed(changed)
+        total = sum(len(t.get("records", {})) for t in state["types"].values())
+        build_report.count("shards", len(partials))
+        print(f"Salvato {args.output} con {total} elementi da {len(partials)} shard"
+              + ("" if changed else " (nessuna modifica)"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+mock_api.py
+
+Server HTTP locale al posto di vixsrc e TMDb, per misurare i generatori senza
+consumare la quota delle API (vedi benchmark.py).
+- /api/list/{movie,tv}: lista di id sintetici, con ETag per il GET condizionale
+- /3/{type}/{id}: risposte di dettaglio registrate (benchmark.py record) usate a
+  rotazione con l'id sostituito, oppure sintetiche se non ci sono registrazioni;
+  append_to_response con credits e season/N
+- /3/{type}/changes: feed delle modifiche a pagine di CHANGES_PAGE_SIZE, con gli
+  ID passati in `changes` o registrati in <fixtures>/changes.json
+  ({"movie": [id, ...], "tv": [...]}); vuoto se non ce ne sono
+- /web/{type}/{id}: pagina del sito TMDb con il titolo, per film.py
+- /t/p/{formato}/{file}: locandine per posters.py, da <fixtures>/images/<file>
+  se c'è, altrimenti un PNG a tinta unita diverso per ogni file
+- Latenza ed errori 5xx configurabili; 429 (con Retry-After) oltre un limite di
+  richieste al secondo, come TMDb, e/o su una quota casuale di richieste
+- /_stats: contatori delle richieste servite; in detail_log gli ID di dettaglio
+  richiesti e in image_log i file delle locandine, per verificare cosa ha
+  riscaricato uno script
+- Per le prove: ID di dettaglio che rispondono 404 (`not_found`) e una pagina
+  del feed che risponde 404 (`broken_changes_page`), cioè un feed incompleto
+Uso diretto: python mock_api.py --size 1000 --port 8765
+"""
+
+import argparse
+import collections
+import copy
+import json
+import os
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# --- Config ---
+TV_SHARE = 0.25          # quota di serie nel catalogo sintetico
+ID_BASE = 1000
+RETRY_AFTER = "1"
+CHANGES_PAGE_SIZE = 100
+IMAGE_SIZE = (60, 90)    # locandine sintetiche: piccole, posters.py le ridimensiona comunque
+GENRES = ["Azione", "Avventura", "Animazione", "Commedia", "Crime", "Documentario",
+          "Dramma", "Famiglia", "Fantasy", "Horror", "Mistero", "Romance", "Thriller"]
+
+
+def load_fixtures(path):
+    """Risposte registrate per tipo: {tipo: [dettaglio, ...]} da <path>/<tipo>.jsonl."""
+    fixtures = {}
+    for type_ in ("movie", "tv"):
+        name = os.path.join(path, f"{type_}.jsonl") if path else ""
+        if name and os.path.exists(name):
+            with open(name, encoding="utf-8") as f:
+                fixtures[type_] = [json.loads(line) for line in f if line.strip()]
+    return fixtures
+
+
+def load_changes(path):
+    """Feed delle modifiche registrato: {tipo: [id, ...]} da <path>/changes.json."""
+    name = os.path.join(path, "changes.json") if path else ""
+    if not name or not os.path.exists(name):
+        return {}
+    with open(name, encoding="utf-8") as f:
+        return {type_: [int(i) for i in ids] for type_, ids in json.load(f).items()}
+
+
+def synthetic_detail(type_, tmdb_id):
+    r = random.Random(f"{type_}-{tmdb_id}")
+    info = {
+        "id": tmdb_id,
+        "poster_path": f"/p{tmdb_id}.jpg",
+        "genres": [{"id": g, "name": GENRES[g]} for g in sorted(r.sample(range(len(GENRES)), 2))],
+        "vote_average": round(r.uniform(4, 9), 1),
+        "overview": " ".join(r.choice(("trama", "storia", "viaggio", "notte", "città")) for _ in range(40)),
+        "credits": {"cast": [{"name": f"Attore {r.randrange(5000)}"} for _ in range(15)]},
+    }
+    year = 1970 + tmdb_id % 55
+    if type_ == "movie":
+        info.update(title=f"Film {tmdb_id}", runtime=80 + tmdb_id % 70, release_date=f"{year}-05-01")
+    else:
+        count = 1 + tmdb_id % 6
+        info.update(name=f"Serie {tmdb_id}", number_of_seasons=count, first_air_date=f"{year}-09-01",
+                    seasons=[{"season_number": n, "episode_count": 6 + (tmdb_id + n) % 8,
+                              "air_date": f"{year + n - 1}-09-01"} for n in range(1, count + 1)])
+    return info
+
+
+def synthetic_image(name, size=IMAGE_SIZE):
+    """PNG a tinta unita con il colore ricavato dal nome del file (solo libreria standard)."""
+    width, height = size
+    color = zlib.crc32(name.encode()).to_bytes(4, "big")[:3]
+    raw = b"".join(b"\x00" + color * width for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+def season_detail(info, number):
+    meta = next((s for s in info.get("seasons", []) if s.get("season_number") == number), None)
+    if meta is None:
+        return None
+    air_date = meta.get("air_date") or ""
+    return {"season_number": number, "air_date": air_date,
+            "episodes": [{"episode_number": e, "name": f"Episodio {e}", "air_date": air_date,
+                          "still_path": f"/s{info['id']}-{number}-{e}.jpg"}
+                         for e in range(1, (meta.get("episode_count") or 0) + 1)]}
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass   # client che chiudono a metà risposta, ad esempio una build interrotta
+
+
+class MockAPI:
+    """Server di prova in un thread; url è la radice da usare per le variabili *_ROOT."""
+
+    def __init__(self, size=1000, latency=0.0, error_rate=0.0, throttle_rate=0.0,
+                 fixtures=None, port=0, seed=0, rate_limit=0, changes=None, not_found=(),
+                 broken_changes_page=None):
+        tv = int(size * TV_SHARE)
+        self.ids = {"movie": list(range(ID_BASE, ID_BASE + size - tv)),
+                    "tv": list(range(ID_BASE, ID_BASE + tv))}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit
+        self.window = collections.deque()   # istanti delle richieste di dettaglio nell'ultimo secondo
+        self.fixtures = load_fixtures(fixtures)
+        self.images_dir = os.path.join(fixtures, "images") if fixtures else None
+        self.changes = changes if changes is not None else load_changes(fixtures)
+        self.not_found = {int(i) for i in not_found}
+        self.broken_changes_page = broken_changes_page
+        self.detail_log = []   # (tipo, id) di ogni dettaglio servito
+        self.image_log = []    # file di ogni locandina servita
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.server = _Server(("127.0.0.1", port), self._handler())
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def env(self):
+        """Variabili d'ambiente che puntano gli script a questo server."""
+        return {"VIXSRC_API_ROOT": self.url + "/api", "TMDB_API_ROOT": self.url + "/3",
+                "TMDB_IMAGE_ROOT": self.url + "/t/p", "TMDB_WEB_ROOT": self.url + "/web",
+                "TMDB_API_KEY": "benchmark"}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def fault(self):
+        """Errore simulato per una richiesta di dettaglio: 429, 503 o nessuno."""
+        now = time.monotonic()
+        with self.lock:
+            roll = self.random.random()
+            while self.window and self.window[0] <= now - 1:
+                self.window.popleft()
+            self.window.append(now)
+            over = self.rate_limit and len(self.window) > self.rate_limit
+        if over or roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+    def detail(self, type_, tmdb_id, append):
+        recorded = self.fixtures.get(type_)
+        if recorded:
+            info = copy.deepcopy(recorded[tmdb_id % len(recorded)])
+            info["id"] = tmdb_id
+        else:
+            info = synthetic_detail(type_, tmdb_id)
+        parts = [p for p in append.split(",") if p]
+        if "credits" not in parts:
+            info.pop("credits", None)
+        for part in parts:
+            if part.startswith("season/"):
+                info[part] = season_detail(info, int(part.split("/")[1]))
+        return info
+
+    def changes_body(self, type_, page):
+        ids = self.changes.get(type_, [])
+        pages = max(1, -(-len(ids) // CHANGES_PAGE_SIZE))
+        chunk = ids[(page - 1) * CHANGES_PAGE_SIZE:page * CHANGES_PAGE_SIZE]
+        return json.dumps({"results": [{"id": i, "adult": False} for i in chunk],
+                           "page": page, "total_pages": pages}).encode()
+
+    def list_body(self, type_):
+        return json.dumps([{"tmdb_id": tmdb_id} for tmdb_id in self.ids[type_]]).encode()
+
+    def image(self, name):
+        path = os.path.join(self.images_dir, name) if self.images_dir else ""
+        if path and os.path.isfile(path):
+            with open(path, "rb") as f:
+                return f.read()
+        return synthetic_image(name)
+
+    def web_page(self, type_, tmdb_id):
+        info = self.detail(type_, tmdb_id, "")
+        title = info.get("title") or info.get("name") or ""
+        return f"<html><head><title>{title} - TMDB</title></head><body><h2>{title}</h2></body></html>".encode()
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def send(self, status, body=b"", content_type="application/json", headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == "/_stats":
+                    return self.send(200, json.dumps(api.snapshot()).encode())
+                if api.latency:
+                    time.sleep(api.latency)
+
+                m = re.match(r"^/api/list/(movie|tv)/?$", url.path)
+                if m:
+                    api.count("list")
+                    body = api.list_body(m.group(1))
+                    etag = '"%08x"' % zlib.crc32(body)
+                    if self.headers.get("If-None-Match") == etag:
+                        api.count("not_modified")
+                        return self.send(304, headers={"ETag": etag})
+                    return self.send(200, body, headers={"ETag": etag})
+
+                m = re.match(r"^/3/(movie|tv)/changes$", url.path)
+                if m:
+                    api.count("changes")
+                    page = int(query.get("page", ["1"])[0])
+                    if page == api.broken_changes_page:
+                        return self.send(404, b'{"status_code":34}')
+                    return self.send(200, api.changes_body(m.group(1), page))
+
+                m = re.match(r"^/3/(movie|tv)/(\d+)$", url.path)
+                if m:
+                    api.count("details")
+                    fault = api.fault()
+                    if fault == 429:
+                        api.count("throttled")
+                        return self.send(429, b'{"status_code":25}', headers={"Retry-After": RETRY_AFTER})
+                    if fault:
+                        api.count("errors")
+                        return self.send(fault, b'{"status_code":11}')
+                    tmdb_id = int(m.group(2))
+                    with api.lock:
+                        api.detail_log.append((m.group(1), tmdb_id))
+                    if tmdb_id in api.not_found:
+                        return self.send(404, b'{"status_code":34}')
+                    append = query.get("append_to_response", [""])[0]
+                    body = json.dumps(api.detail(m.group(1), tmdb_id, append)).encode()
+                    return self.send(200, body)
+
+                m = re.match(r"^/web/(movie|tv)/(\d+)$", url.path)
+                if m:
+                    api.count("web")
+                    return self.send(200, api.web_page(m.group(1), int(m.group(2))), "text/html; charset=utf-8")
+
+                m = re.match(r"^/t/p/\w+/([\w.-]+)$", url.path)
+                if m:
+                    api.count("images")
+                    with api.lock:
+                        api.image_log.append(m.group(1))
+                    body = api.image(m.group(1))
+                    return self.send(200, body, "image/png" if body.startswith(b"\x89PNG") else "image/jpeg")
+
+                api.count("not_found")
+                return self.send(404, b'{"status_code":34}')
+
+        return Handler
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Server locale al posto di vixsrc e TMDb")
+    parser.add_argument("--size", type=int, default=1000, help="titoli nel catalogo (film + serie)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="secondi di attesa per richiesta")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="quota di dettagli con errore 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="quota di dettagli con errore 429")
+    parser.add_argument("--rate-limit", type=int, default=0, help="dettagli al secondo oltre i quali si risponde 429")
+    parser.add_argument("--fixtures", help="cartella con movie.jsonl e tv.jsonl registrati")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    api = MockAPI(args.size, args.latency, args.error_rate, args.throttle_rate, args.fixtures, args.port,
+                  rate_limit=args.rate_limit)
+    print(f"Server di prova su {api.url}")
+    for name, value in api.env().items():
+        print(f"  {name}={value}")
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+posters.py
+
+Miniature locali delle locandine, da eseguire dopo ingest.py.
+- Ogni poster_path del dataset viene scaricato una volta sola (TMDB_IMAGE_ROOT,
+  formato SOURCE_SIZE) e salvato in POSTER_DIR con nome dato dall'hash del
+  contenuto, in WebP alle larghezze POSTER_WIDTHS (100/160/300 px)
+- Le locandine già presenti (stesso poster_path e file esistenti) si saltano
+- Nel dataset ogni voce riceve la chiave della miniatura (campo `thumb`); le
+  pagine la usano per `srcset` e ripiegano sulla locandina TMDb se manca
+- I file non più usati da nessuna voce vengono rimossi
+- Per la striscia "Ultime Novità" generate_index.py può comporre le miniature
+  in un'unica immagine (build_sprite) o incorporarne un'anteprima minuscola in
+  base64 (lqip)
+Richiede Pillow; senza, non fa nulla e le pagine restano sulle immagini TMDb.
+--report e --profile come in build_report.py.
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import os
+import threading
+
+import build_report
+from catalog_state import STATE_PATH, load_dataset, save_state
+from entries import TMDB_IMAGE_ROOT
+from fetch_engine import iter_fetch
+from tmdb_client import TMDbClient
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# --- Config ---
+POSTER_DIR = os.getenv("POSTER_DIR", "posters")
+POSTER_WIDTHS = (100, 160, 300)
+SOURCE_SIZE = "w342"       # il formato TMDb più piccolo che copre i 300 px
+WEBP_QUALITY = 80
+KEY_LENGTH = 16
+SPRITE_PREFIX = "latest-"
+SPRITE_TILE = (160, 240)   # mostrate a 100 px: nitide anche su schermi ad alta densità
+LQIP_WIDTH = 16
+
+
+def pillow_available():
+    return Image is not None
+
+
+def poster_config():
+    """Descrizione delle miniature per gli script delle pagine."""
+    return {"dir": POSTER_DIR, "widths": list(POSTER_WIDTHS)}
+
+
+def variant_path(key, width, poster_dir=POSTER_DIR):
+    return os.path.join(poster_dir, f"{key}-{width}.webp")
+
+
+def srcset(key, poster_dir=POSTER_DIR):
+    return ", ".join(f"{poster_dir}/{key}-{w}.webp {w}w" for w in POSTER_WIDTHS)
+
+
+def poster_path(entry):
+    """poster_path TMDb di una voce del dataset ("" se non ha locandina)."""
+    poster = entry.get("poster") or ""
+    # solo il nome del file: non dipende da TMDB_IMAGE_ROOT né dal formato
+    return "/" + poster.rsplit("/", 1)[-1] if poster else ""
+
+
+def write_variants(data, poster_dir=POSTER_DIR):
+    """Salva le varianti WebP dell'immagine e restituisce la chiave (hash del contenuto)."""
+    key = hashlib.sha256(data).hexdigest()[:KEY_LENGTH]
+    if all(os.path.exists(variant_path(key, w, poster_dir)) for w in POSTER_WIDTHS):
+        return key
+    with Image.open(io.BytesIO(data)) as img:
+        img = img.convert("RGB")
+        for width in POSTER_WIDTHS:
+            height = max(1, round(img.height * width / img.width))
+            path = variant_path(key, width, poster_dir)
+            tmp = f"{path}.{threading.get_ident()}.tmp"   # stessa immagine su due percorsi
+            img.resize((width, height), Image.LANCZOS).save(tmp, "WEBP", quality=WEBP_QUALITY, method=6)
+            os.replace(tmp, path)
+    return key
+
+
+def update_posters(state, client, poster_dir=POSTER_DIR):
+    """Scarica le locandine nuove, assegna `thumb` alle voci e restituisce (scaricate, rimosse)."""
+    os.makedirs(poster_dir, exist_ok=True)
+    known = state.get("posters", {})
+    entries = [record["entry"] for type_state in state["types"].values()
+               for record in type_state.get("records", {}).values()]
+    paths = list(dict.fromkeys(p for p in map(poster_path, entries) if p))
+    todo = [p for p in paths if p not in known
+            or not all(os.path.exists(variant_path(known[p], w, poster_dir)) for w in POSTER_WIDTHS)]
+
+    def fetch(path):
+        r = client.request(f"{TMDB_IMAGE_ROOT}/{SOURCE_SIZE}{path}", timeout=20, throttle=False, endpoint="image")
+        return write_variants(r.content, poster_dir)
+
+    posters = {p: known[p] for p in paths if p in known and p not in todo}
+    fetched = {p: key for p, key in iter_fetch(fetch, todo) if key}
+    posters.update(fetched)
+    state["posters"] = posters
+    for entry in entries:
+        entry["thumb"] = posters.get(poster_path(entry), "")
+
+    used = {variant_path(key, w, poster_dir) for key in posters.values() for w in POSTER_WIDTHS}
+    removed = 0
+    for name in os.listdir(poster_dir):
+        path = os.path.join(poster_dir, name)
+        if name.endswith(".webp") and path not in used and not name.startswith(SPRITE_PREFIX):
+            os.remove(path)
+            removed += 1
+    return len(fetched), removed
+
+
+def build_sprite(keys, poster_dir=POSTER_DIR):
+    """Compone le miniature in fila in una sola immagine e restituisce il nome del file.
+
+    Il nome dipende dalle locandine contenute; le composizioni precedenti vengono rimosse.
+    """
+    name = SPRITE_PREFIX + hashlib.sha256(",".join(keys).encode()).hexdigest()[:KEY_LENGTH] + ".webp"
+    path = os.path.join(poster_dir, name)
+    if not os.path.exists(path):
+        width, height = SPRITE_TILE
+        sheet = Image.new("RGB", (width * len(keys), height))
+        for i, key in enumerate(keys):
+            with Image.open(variant_path(key, POSTER_WIDTHS[1], poster_dir)) as img:
+                sheet.paste(img.convert("RGB").resize(SPRITE_TILE, Image.LANCZOS), (i * width, 0))
+        sheet.save(path + ".tmp", "WEBP", quality=WEBP_QUALITY, method=6)
+        os.replace(path + ".tmp", path)
+    for old in os.listdir(poster_dir):
+        if old.startswith(SPRITE_PREFIX) and old != name:
+            os.remove(os.path.join(poster_dir, old))
+    return name
+
+
+def lqip(key, poster_dir=POSTER_DIR):
+    """Anteprima minuscola della locandina come data URI, da mostrare prima di quella vera."""
+    with Image.open(variant_path(key, POSTER_WIDTHS[0], poster_dir)) as img:
+        height = max(1, round(img.height * LQIP_WIDTH / img.width))
+        buf = io.BytesIO()
+        img.convert("RGB").resize((LQIP_WIDTH, height), Image.LANCZOS).save(buf, "WEBP", quality=40)
+    return "data:image/webp;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Miniature WebP locali delle locandine del dataset")
+    parser.add_argument("dataset", nargs="?", default=STATE_PATH, help=f"percorso del dataset (default {STATE_PATH})")
+    build_report.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    if Image is None:
+        print("Pillow non installato: miniature non generate, le pagine usano le locandine TMDb")
+        return
+    with build_report.session("posters", args.report, args.profile):
+        with build_report.stage("load"):
+            state = load_dataset(args.dataset)
+        client = TMDbClient(None)   # le immagini non richiedono la chiave API
+        try:
+            with build_report.stage("image_fetch"):
+                downloaded, removed = update_posters(state, client)
+        finally:
+            client.close()
+        with build_report.stage("write"):
+            save_state(state, args.dataset)
+        build_report.count("images.downloaded", downloaded)
+        build_report.count("images.removed", removed)
+        print(f"Miniature in {POSTER_DIR}: {len(state['posters'])} locandine, {downloaded} nuove, {removed} file rimossi")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+search_index.py
+
+Indice di ricerca precalcolato per la casella "Cerca...".
+- Titoli e nomi del cast (quelli mostrati nella scheda) normalizzati: minuscole,
+  senza accenti né punteggiatura
+- Per ogni parola: i prefissi di 1 e 2 caratteri e tutti i trigrammi
+- Ogni chiave punta alla lista ordinata delle posizioni dei titoli nel tipo,
+  salvata come differenze successive per occupare meno spazio
+- I trigrammi possono venire da parole diverse ("mar" e "are" in "Marte e
+  Clare"): per questo l'indice contiene anche i testi normalizzati di ogni
+  titolo (titolo e cast, uno per riga): la pagina tiene solo i candidati con
+  un testo che contiene tutte le parole della ricerca
+La normalizzazione deve restare identica a normalize() nello script della pagina.
+
+Contiene anche l'indice dei generi: per ogni ID di genere le posizioni dei titoli
+che lo hanno, più l'elenco degli ID TMDb per tradurre i preferiti in posizioni.
+"""
+
+import re
+import unicodedata
+
+_SPACES = re.compile(r" +")
+
+
+def normalize(text):
+    """Come normalize() in app.js: via i segni (categoria M), minuscole, spazio al posto di ciò che non è L o N."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.category(c).startswith("M")).lower()
+    text = "".join(c if unicodedata.category(c)[0] in "LN" else " " for c in text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def word_keys(word):
+    keys = {word[:1], word[:2]}
+    keys.update(word[i:i + 3] for i in range(len(word) - 2))
+    return keys
+
+
+def entry_texts(entry):
+    return [normalize(text) for text in [entry.title] + list(entry.cast)]
+
+
+def entry_keys(entry):
+    keys = set()
+    for text in entry_texts(entry):
+        for word in text.split():
+            keys |= word_keys(word)
+    return keys
+
+
+def delta_encode(positions):
+    out, last = [], 0
+    for pos in positions:
+        out.append(pos - last)
+        last = pos
+    return out
+
+
+def build_search_index(items):
+    """{"keys": {chiave: [delta posizioni]}, "texts": [testi normalizzati]} per le voci di un tipo."""
+    postings = {}
+    for pos, entry in enumerate(items):
+        for key in entry_keys(entry):
+            postings.setdefault(key, []).append(pos)
+    return {"keys": {key: delta_encode(postings[key]) for key in sorted(postings)},
+            "texts": ["\n".join(entry_texts(entry)) for entry in items]}
+
+
+def build_genre_index(items, genre_ids):
+    postings = {}
+    for pos, entry in enumerate(items):
+        for name in entry.genres:
+            postings.setdefault(genre_ids[name], []).append(pos)
+    return {
+        "ids": [entry.id for entry in items],
+        "genres": {str(gid): delta_encode(postings[gid]) for gid in sorted(postings)},
+    }
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+service_worker.py
+
+Cache offline di index.html per chi torna sul sito.
+- sw-manifest.json: versione della build, file di dati (con l'hash nel nome,
+  vedi data_shards.py), stile e script (static_assets.py) e chiavi delle
+  miniature (vedi posters.py)
+- sw.js: il service worker, con la versione incorporata così che il browser
+  lo reinstalli solo quando la build cambia davvero
+  - la pagina è servita dalla Cache Storage della sua versione; la nuova
+    versione si attiva quando non ci sono più schede aperte con la vecchia
+  - i file di dati e gli asset si scaricano una volta sola: un file invariato
+    ha lo stesso nome e resta in cache, quelli che non compaiono più nel
+    manifest si rimuovono
+  - le miniature locali stanno in una cache LRU di al più POSTER_CACHE_LIMIT file
+"""
+
+import hashlib
+import json
+import os
+
+from data_shards import script_json
+from static_assets import ASSET_DIR
+
+# --- Config ---
+SW_PATH = "sw.js"
+SW_MANIFEST = "sw-manifest.json"
+POSTER_CACHE_LIMIT = int(os.getenv("SW_POSTER_LIMIT", "600"))
+VERSION_LENGTH = 12
+
+
+def shard_files(manifest):
+    """Percorsi di tutti i file di dati elencati nel manifest di data_shards."""
+    files = []
+    for type_info in manifest["types"].values():
+        names = type_info["pages"] + type_info["details"] + [type_info["search"], type_info["genreIndex"]]
+        files.extend(f"{manifest['dir']}/{name}" for name in names)
+    return files
+
+
+def offline_manifest(manifest, html, shell, assets, poster_keys):
+    """Manifest per sw.js; la versione è l'hash della pagina, che elenca già i file di dati."""
+    return {
+        "version": hashlib.sha256(html.encode("utf-8")).hexdigest()[:VERSION_LENGTH],
+        "shell": shell,
+        "dataDir": manifest["dir"],
+        "data": shard_files(manifest),
+        "assets": assets,
+        "posters": {"dir": manifest["posters"]["dir"], "keys": sorted(set(poster_keys))},
+    }
+
+
+def service_worker_js(offline):
+    return f"""// Generato da service_worker.py: non modificare a mano.
+const VERSION = {script_json(offline["version"])};
+const MANIFEST_URL = {script_json(SW_MANIFEST)};
+const SHELL_CACHE = 'shell-' + VERSION, DATA_CACHE = 'data', POSTER_CACHE = 'posters';
+const POSTER_CACHE_LIMIT = {POSTER_CACHE_LIMIT};
+const scoped = path => new URL(path, self.registration.scope).href;
+
+self.addEventListener('install', event => {{
+    event.waitUntil((async () => {{
+        const res = await fetch(MANIFEST_URL + '?v=' + VERSION, {{cache: 'no-cache'}});
+        const manifest = await res.clone().json();
+        /* pagina e worker devono essere della stessa build, altrimenti si riprova più tardi */
+        if(manifest.version !== VERSION) throw new Error('manifest ' + manifest.version + ' != ' + VERSION);
+        const cache = await caches.open(SHELL_CACHE);
+        await cache.put(scoped(MANIFEST_URL), res);
+        await Promise.all(manifest.shell.map(async path => {{
+            const page = await fetch(path, {{cache: 'no-cache'}});
+            if(!page.ok) throw new Error(path + ' ' + page.status);
+            await cache.put(scoped(path), page);
+        }}));
+        /* stile e script servono anche offline; quelli invariati sono già in cache */
+        const files = await caches.open(DATA_CACHE);
+        await Promise.all(manifest.assets.map(async path => {{
+            if(await files.match(scoped(path))) return;
+            const res = await fetch(path);
+            if(!res.ok) throw new Error(path + ' ' + res.status);
+            await files.put(scoped(path), res);
+        }}));
+    }})());
+}});
+
+/* nessuno skipWaiting: le schede aperte continuano a usare la loro versione e i loro file */
+self.addEventListener('activate', event => {{
+    event.waitUntil((async () => {{
+        const manifest = await (await caches.match(scoped(MANIFEST_URL), {{cacheName: SHELL_CACHE}})).json();
+        for(const name of await caches.keys())
+            if(name.startsWith('shell-') && name !== SHELL_CACHE) await caches.delete(name);
+        const data = new Set(manifest.data.concat(manifest.assets).map(scoped));
+        const dataCache = await caches.open(DATA_CACHE);
+        for(const req of await dataCache.keys())
+            if(!data.has(req.url)) await dataCache.delete(req);
+        /* miniature di locandine uscite dal catalogo (le composizioni "latest-" restano all'LRU) */
+        const keys = new Set(manifest.posters.keys);
+        const posterCache = await caches.open(POSTER_CACHE);
+        for(const req of await posterCache.keys()) {{
+            const m = req.url.match(/\\/([0-9a-f]+)-\\d+\\.webp$/);
+            if(m && !keys.has(m[1])) await posterCache.delete(req);
+        }}
+        await self.clients.claim();
+    }})());
+}});
+
+async function shellResponse(request) {{
+    const cache = await caches.open(SHELL_CACHE);
+    return (await cache.match(scoped('index.html'))) || fetch(request);
+}}
+
+/* file di dati e asset: il nome contiene l'hash del contenuto, quindi la copia in cache non scade */
+async function dataResponse(request) {{
+    const cache = await caches.open(DATA_CACHE);
+    const hit = await cache.match(request);
+    if(hit) return hit;
+    const res = await fetch(request);
+    if(res.ok) await cache.put(request, res.clone());
+    return res;
+}}
+
+/* LRU: l'ordine delle chiavi della cache è quello di inserimento, un accesso reinserisce la voce */
+async function posterResponse(request, event) {{
+    const cache = await caches.open(POSTER_CACHE);
+    const hit = await cache.match(request);
+    if(hit) {{
+        const copy = hit.clone();
+        event.waitUntil(cache.delete(request).then(() => cache.put(request, copy)));
+        return hit;
+    }}
+    const res = await fetch(request);
+    if(res.ok) event.waitUntil(cache.put(request, res.clone()).then(() => trimPosters(cache)));
+    return res;
+}}
+
+async function trimPosters(cache) {{
+    const keys = await cache.keys();
+    for(const req of keys.slice(0, Math.max(0, keys.length - POSTER_CACHE_LIMIT))) await cache.delete(req);
+}}
+
+self.addEventListener('fetch', event => {{
+    const request = event.request;
+    if(request.method !== 'GET') return;
+    const url = new URL(request.url);
+    if(url.origin !== self.location.origin) return;
+    const path = url.pathname.slice(new URL(self.registration.scope).pathname.length);
+    if(request.mode === 'navigate' && (path === '' || path === 'index.html'))
+        event.respondWith(shellResponse(request));
+    else if(path.startsWith({script_json(offline["dataDir"] + "/")}) || path.startsWith({script_json(ASSET_DIR + "/")}))
+        event.respondWith(dataResponse(request));
+    else if(path.startsWith({script_json(offline["posters"]["dir"] + "/")}) && path.endsWith('.webp'))
+        event.respondWith(posterResponse(request, event));
+}});
+"""
+
+
+def write_service_worker(manifest, html, shell=("index.html",), assets=(), poster_keys=()):
+    """Scrive sw-manifest.json e sw.js e restituisce la versione."""
+    offline = offline_manifest(manifest, html, list(shell), list(assets), poster_keys)
+    with open(SW_MANIFEST, "w", encoding="utf-8") as f:
+        json.dump(offline, f, ensure_ascii=False, separators=(",", ":"))
+    with open(SW_PATH, "w", encoding="utf-8") as f:
+        f.write(service_worker_js(offline))
+    return offline["version"]
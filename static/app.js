@@ -0,0 +1,609 @@
+const store = {};        // tipo -> array (sparso) delle voci caricate, per posizione
+const pagesLoading = {}; // "tipo-pagina" -> Promise del file JSON
+const detailsLoading = {}; // "tipo-gruppo" -> Promise dei dettagli (array per posizione)
+
+/* i file sono colonnari ({campo: [valori]}): si ricompongono gli oggetti per titolo */
+function unpack(cols) {
+    const keys = Object.keys(cols);
+    const n = keys.length ? cols[keys[0]].length : 0;
+    const out = new Array(n);
+    for(let i=0;i<n;i++) {
+        const m = {};
+        for(const k of keys) m[k] = cols[k][i];
+        out[i] = m;
+    }
+    return out;
+}
+
+function storePage(t, p, cols) {
+    const list = store[t] || (store[t] = []);
+    unpack(cols).forEach((m, i) => {
+        m.type = t;
+        m.pos = p * catalog.pageSize + i;
+        list[m.pos] = m;
+    });
+}
+
+function loadPage(t, p) {
+    const key = t + '-' + p;
+    if(!pagesLoading[key]) {
+        pagesLoading[key] = fetch(catalog.dir + '/' + catalog.types[t].pages[p])
+            .then(r => r.json())
+            .then(cols => storePage(t, p, cols))
+            .catch(err => { delete pagesLoading[key]; throw err; });
+    }
+    return pagesLoading[key];
+}
+
+storePage('movie', 0, FIRST_PAGE);
+pagesLoading['movie-0'] = Promise.resolve();
+
+function loadDetails(item) {
+    const t = item.type, size = catalog.detailSize;
+    const bundle = Math.floor(item.pos / size), key = t + '-' + bundle;
+    if(!detailsLoading[key]) {
+        detailsLoading[key] = fetch(catalog.dir + '/' + catalog.types[t].details[bundle])
+            .then(r => r.json())
+            .then(unpack)
+            .catch(err => { delete detailsLoading[key]; throw err; });
+    }
+    return detailsLoading[key].then(list => list[item.pos - bundle * size] || {});
+}
+
+const searchLoading = {}; // tipo -> Promise dell'indice di ricerca
+const postingCache = {};
+
+function loadSearch(t) {
+    if(!searchLoading[t]) {
+        searchLoading[t] = fetch(catalog.dir + '/' + catalog.types[t].search)
+            .then(r => r.json())
+            .catch(err => { delete searchLoading[t]; throw err; });
+    }
+    return searchLoading[t];
+}
+
+/* deve restare identica a search_index.normalize() */
+function normalize(text) {
+    return (text || '').normalize('NFKD').replace(/\p{M}/gu, '').toLowerCase()
+        .replace(/[^\p{L}\p{N}]+/gu, ' ').trim();
+}
+
+function queryKeys(q) {
+    const keys = new Set();
+    normalize(q).split(' ').filter(Boolean).forEach(w => {
+        const cs = Array.from(w);
+        if(cs.length < 3) { keys.add(w); return; }
+        for(let i=0;i+3<=cs.length;i++) keys.add(cs.slice(i, i+3).join(''));
+    });
+    return [...keys];
+}
+
+/* le liste di posizioni sono salvate come differenze successive */
+function decoded(cacheKey, deltas) {
+    if(!postingCache[cacheKey]) {
+        let last = 0;
+        postingCache[cacheKey] = (deltas || []).map(d => last += d);
+    }
+    return postingCache[cacheKey];
+}
+
+/* intersezione di liste ordinate, partendo dalla più corta */
+function intersectSorted(lists) {
+    lists = lists.filter(l => l !== null);
+    if(!lists.length) return null;
+    lists.sort((a, b) => a.length - b.length);
+    let result = lists[0];
+    for(const list of lists.slice(1)) {
+        const out = [];
+        let i = 0, j = 0;
+        while(i < result.length && j < list.length) {
+            if(result[i] === list[j]) { out.push(result[i]); i++; j++; }
+            else if(result[i] < list[j]) i++;
+            else j++;
+        }
+        result = out;
+        if(!result.length) break;
+    }
+    return result;
+}
+
+/* posizioni (ordinate) dei titoli in cui il titolo o un nome del cast contiene tutte
+   le parole della ricerca: le chiavi danno i candidati, i testi normalizzati (uno per
+   riga) scartano quelli con trigrammi presi da parole diverse */
+async function searchPositions(t, q) {
+    const keys = queryKeys(q);
+    if(!keys.length) return null;
+    const index = await loadSearch(t);
+    const words = normalize(q).split(' ');
+    const candidates = intersectSorted(keys.map(k => decoded(t + ':' + k, index.keys[k])));
+    return candidates && candidates.filter(pos =>
+        index.texts[pos].split('\n').some(text => words.every(w => text.includes(w))));
+}
+
+const genresLoading = {}; // tipo -> Promise dell'indice dei generi
+
+function loadGenreIndex(t) {
+    if(!genresLoading[t]) {
+        genresLoading[t] = fetch(catalog.dir + '/' + catalog.types[t].genreIndex)
+            .then(r => r.json())
+            .catch(err => { delete genresLoading[t]; throw err; });
+    }
+    return genresLoading[t];
+}
+
+/* posizioni dei titoli che hanno tutti i generi scelti (preferiti compresi) */
+async function genrePositions(t, gSel) {
+    if(!gSel.length || gSel.includes('all')) return null;
+    const index = await loadGenreIndex(t);
+    return intersectSorted(gSel.map(g => {
+        if(g !== 'favorites') return decoded(t + '#' + g, index.genres[g]);
+        const favSet = new Set(favorites.map(String));
+        const out = [];
+        index.ids.forEach((id, pos) => { if(favSet.has(String(id))) out.push(pos); });
+        return out;
+    }));
+}
+
+function findItem(id) {
+    for(const t in store) {
+        const item = store[t].find(x => x && String(x.id) === String(id));
+        if(item) return item;
+    }
+    return null;
+}
+let favorites = JSON.parse(localStorage.getItem("favorites") || "[]");
+let currentItem = null;
+
+function toggleFavorite(id) {
+  if(favorites.includes(id)) {
+    favorites = favorites.filter(f=>f!==id);
+  } else {
+    favorites.push(id);
+  }
+  localStorage.setItem("favorites", JSON.stringify(favorites));
+  render(true);
+}
+
+const grid=document.getElementById('moviesGrid');
+const overlay=document.getElementById('playerOverlay');
+const iframe=overlay.querySelector('iframe');
+const infoCard=document.getElementById('infoCard');
+const infoTitle=document.getElementById('infoTitle');
+const infoGenres=document.getElementById('infoGenres');
+const infoVote=document.getElementById('infoVote');
+const infoOverview=document.getElementById('infoOverview');
+const playBtn=document.getElementById('playBtn');
+const closeCardBtn=document.getElementById('closeCardBtn');
+const latestDiv=document.getElementById('latest');
+const favoriteInCard=document.getElementById('favoriteInCard');
+const seasonSelect=document.getElementById('seasonSelect');
+const episodeSelect=document.getElementById('episodeSelect');
+const infoYear=document.getElementById('infoYear');
+const infoDuration=document.getElementById('infoDuration');
+const infoCast=document.getElementById('infoCast');
+
+closeCardBtn.onclick = () => {
+  infoCard.style.display='none';
+  history.pushState({page:"grid"}, "", "#grid");
+};
+
+function showLatest(){
+    let scrollPos = 0;
+    function scroll() {
+        scrollPos += 1;
+        if(scrollPos > latestDiv.scrollWidth - latestDiv.clientWidth) scrollPos = 0;
+        latestDiv.scrollTo({ left: scrollPos, behavior: 'smooth' });
+    }
+    setInterval(scroll, 30);
+}
+
+/* anteprime LQIP: le locandine vere si caricano solo a pagina completa */
+window.addEventListener('load', () => {
+    latestDiv.querySelectorAll('img[data-srcset]').forEach(img => {
+        img.onload = () => img.classList.remove('lqip');
+        img.sizes = '100px';
+        img.srcset = img.dataset.srcset;
+    });
+});
+
+function openInfo(item, push=true) {
+    currentItem = item;
+    infoCard.style.display='block';
+    infoCard.style.backgroundImage = "none";
+    infoCard.style.backgroundColor = "rgba(0,0,0,0.85)";
+    infoTitle.textContent = item.title;
+    infoGenres.textContent = "Generi: " + item.genres.map(g => catalog.genres[g]).join(", ");
+    infoVote.textContent = "★ " + item.vote;
+    infoOverview.textContent = "";
+    infoYear.textContent = item.year ? "Anno: " + item.year : "";
+    infoDuration.textContent = item.duration ? "Durata: " + item.duration + " min" : "";
+    infoCast.textContent = "";
+
+    favoriteInCard.classList.toggle("active", favorites.includes(item.id));
+    favoriteInCard.onclick = () => {
+        toggleFavorite(item.id);
+        favoriteInCard.classList.toggle("active", favorites.includes(item.id));
+    };
+
+    seasonSelect.style.display = 'none';
+    episodeSelect.style.display = 'none';
+    seasonSelect.innerHTML = "";
+    episodeSelect.innerHTML = "";
+
+    playBtn.onclick = () => openPlayer(item);
+
+    if(push) {
+        history.pushState({page:"info", itemId:item.id}, "", "#info-"+item.id);
+    }
+
+    /* trama, cast e stagioni arrivano dal file di dettaglio */
+    loadDetails(item).then(details => {
+        if(currentItem === item) showDetails(item, details);
+    });
+}
+
+function showDetails(item, details) {
+    infoOverview.textContent = details.overview || "";
+    infoCast.textContent = details.cast && details.cast.length ? "Cast: " + details.cast.slice(0,5).join(", ") : "";
+
+    if(item.type==='tv') {
+        seasonSelect.style.display = 'inline';
+        episodeSelect.style.display = 'inline';
+        seasonSelect.innerHTML = "";
+        for(let s=1;s<=(details.seasons || 1);s++) {
+            let o = document.createElement('option');
+            o.value = s;
+            o.textContent = "Stagione " + s;
+            seasonSelect.appendChild(o);
+        }
+        seasonSelect.onchange = updateEpisodes;
+        updateEpisodes();
+    }
+
+    function updateEpisodes() {
+        let season = parseInt(seasonSelect.value);
+        /* titoli e date degli episodi, se il dataset è stato arricchito */
+        let list = ((details.episode_info || {})[season] || {}).episodes || [];
+        let epCount = list.length || (details.episodes || {})[season] || 1;
+        episodeSelect.innerHTML = "";
+        for(let e=1;e<=epCount;e++) {
+            let o = document.createElement('option');
+            let [name, airDate] = list[e-1] || [];
+            o.value = e;
+            o.textContent = "Episodio " + e + (name ? " - " + name : "");
+            if(airDate) o.title = airDate;
+            episodeSelect.appendChild(o);
+        }
+    }
+}
+
+function openPlayer(item, push=true) {
+    infoCard.style.display = 'none';
+    overlay.style.display='flex';
+    let link;
+    if(item.type==='tv') {
+        let season = parseInt(seasonSelect.value) || 1;
+        let episode = parseInt(episodeSelect.value) || 1;
+        link = `https://vixsrc.to/tv/${item.id}/${season}/${episode}?lang=it&sottotitoli=off&autoplay=1`;
+    } else {
+        link = `https://vixsrc.to/movie/${item.id}/?lang=it&sottotitoli=off&autoplay=1`;
+    }
+    iframe.src = link;
+    if (overlay.requestFullscreen) overlay.requestFullscreen();
+    else if (overlay.webkitRequestFullscreen) overlay.webkitRequestFullscreen();
+    else if (overlay.msRequestFullscreen) overlay.msRequestFullscreen();
+
+    if(push) {
+        history.pushState({page:"player", itemId:item.id}, "", "#player-"+item.id);
+    }
+}
+
+function closePlayer(push=true) {
+    overlay.style.display='none';
+    iframe.src='';
+    if (document.fullscreenElement) document.exitFullscreen();
+    else if (document.webkitFullscreenElement) document.webkitExitFullscreen();
+    else if (document.msFullscreenElement) document.msExitFullscreen();
+
+    if(currentItem) {
+        infoCard.style.display = 'block';
+        if(push) {
+            history.pushState({page:"info", itemId:currentItem.id}, "", "#info-"+currentItem.id);
+        }
+    }
+}
+
+/* Gestione popstate corretta */
+window.addEventListener("popstate", function(e) {
+    const state = e.state;
+
+    if(!state || state.page==="grid" || state.page==="home") {
+        overlay.style.display='none';
+        iframe.src='';
+        infoCard.style.display='none';
+        return;
+    }
+
+    const itemId = state.itemId;
+    const item = findItem(itemId);
+    if(!item) {
+        overlay.style.display='none';
+        iframe.src='';
+        infoCard.style.display='none';
+        return;
+    }
+
+    if(state.page === "player") {
+        openPlayer(item, false);
+    } else if(state.page === "info") {
+        if(overlay.style.display==='flex') {
+            closePlayer(false); // prima chiudi il player se è aperto
+        }
+        openInfo(item, false);
+    } else {
+        overlay.style.display='none';
+        iframe.src='';
+        infoCard.style.display='none';
+    }
+});
+
+let currentType='movie', shown=0, renderToken=0, results=null, resetting=false;
+
+function typeCount(t) {
+    return catalog.types[t] ? catalog.types[t].count : 0;
+}
+
+function resultCount() {
+    return results ? results.length : typeCount(currentType);
+}
+
+function debounce(fn, ms) {
+    let timer = null;
+    return (...args) => {
+        clearTimeout(timer);
+        timer = setTimeout(() => fn(...args), ms);
+    };
+}
+
+/* una card viene creata una volta sola e riempita con fillCard (anche quando è riciclata) */
+function createCard() {
+    const card = document.createElement('div');
+    card.className='card';
+    card.innerHTML = `
+        <img class='poster' alt='' width='160' height='240' decoding='async'>
+        <div class='badge'></div>
+        <p class='meta' style="margin:2px 0;font-size:12px;color:#ccc;"></p>
+        <span class="favorite-btn" style="pointer-events:none;">★</span>
+    `;
+    card.onclick = () => openInfo(card.item);
+    return card;
+}
+
+/* miniature WebP locali (posters.py) se ci sono, altrimenti la locandina TMDb.
+   La prima riga della griglia ha priorità alta, le altre si caricano in modo lazy. */
+function setPoster(img, m, size, firstRow=false) {
+    const p = catalog.posters;
+    img.loading = firstRow ? 'eager' : 'lazy';
+    img.fetchPriority = firstRow ? 'high' : 'auto';
+    if(m.thumb && p) {
+        img.srcset = p.widths.map(w => `${p.dir}/${m.thumb}-${w}.webp ${w}w`).join(', ');
+        img.sizes = size;
+        img.src = `${p.dir}/${m.thumb}-${p.widths[p.widths.length - 1]}.webp`;
+    } else {
+        img.srcset = '';
+        img.src = m.poster;
+    }
+}
+
+/* una locandina non ancora arrivata si annulla quando la card esce dalla finestra */
+function cancelPoster(img) {
+    if(img.complete) return;
+    img.srcset = '';
+    img.removeAttribute('src');
+}
+
+function fillCard(card, m, firstRow=false) {
+    card.item = m;
+    const img = card.querySelector('.poster');
+    setPoster(img, m, Math.round(layout.cardWidth) + 'px', firstRow);
+    img.alt = m.title;
+    card.querySelector('.badge').textContent = m.vote;
+    card.querySelector('.meta').textContent = (m.duration ? m.duration + ' min • ' : '') + (m.year ? m.year : '');
+    card.querySelector('.favorite-btn').classList.toggle('active', favorites.includes(m.id));
+}
+
+/* le card della prima pagina arrivano già nell'HTML: si adottano invece di ricrearle */
+let prerendered = 0;
+
+function adoptPrerendered() {
+    const cards = Array.from(grid.querySelectorAll('.card'));
+    cards.forEach(card => {
+        card.item = store.movie[+card.dataset.pos];
+        card.onclick = () => openInfo(card.item);
+        card.querySelector('.favorite-btn').classList.toggle('active', favorites.includes(card.item.id));
+    });
+    /* nella griglia a finestra diventano le prime card riciclate, in ordine di posizione */
+    if(VIRTUAL_GRID) freeCards.push(...cards.reverse());
+    return cards.length;
+}
+
+async function render(reset=false) {
+    if(!reset && resetting) return;
+    const token = ++renderToken;
+    if(reset && prerendered && !VIRTUAL_GRID) {
+        shown = prerendered;
+        prerendered = 0;
+        return;
+    }
+    prerendered = 0;
+    if(reset){
+        if(!VIRTUAL_GRID) {
+            grid.querySelectorAll('.poster').forEach(cancelPoster);
+            grid.innerHTML='';
+        }
+        shown=0;
+        /* ricerca e generi passano dagli indici: results è l'elenco delle posizioni trovate */
+        resetting = true;
+        const gSel = Array.from(document.getElementById('genreSelect').selectedOptions).map(o=>o.value);
+        const found = await Promise.all([
+            searchPositions(currentType, document.getElementById('searchBox').value),
+            genrePositions(currentType, gSel)
+        ]).catch(() => [null, null]);
+        if(token !== renderToken) return;
+        results = intersectSorted(found);
+        resetting = false;
+    }
+    if(VIRTUAL_GRID) {
+        resetWindow();
+        return;
+    }
+    let count=0;
+    const total = resultCount();
+    while(shown<total && count<40) {
+        const pos = results ? results[shown] : shown;
+        if(!(store[currentType] && store[currentType][pos])) {
+            await loadPage(currentType, Math.floor(pos / catalog.pageSize));
+            if(token !== renderToken) return;
+        }
+        const card = createCard();
+        fillCard(card, store[currentType][pos], shown < gridColumns());
+        shown++;
+        grid.appendChild(card);
+        count++;
+    }
+}
+
+/* --- Griglia a finestra: nel DOM restano solo le righe visibili --- */
+const CARD_MIN_WIDTH = 120, CARD_GAP = 12, CARD_META_HEIGHT = 24, ROW_OVERSCAN = 2;
+let layout = {cols: 1, cardWidth: CARD_MIN_WIDTH, rowHeight: 1};
+const activeCards = new Map(); // indice nei risultati -> card
+const freeCards = [];
+let windowQueued = false;
+
+function gridColumns() {
+    const width = grid.clientWidth || CARD_MIN_WIDTH;
+    return Math.max(1, Math.floor((width + CARD_GAP) / (CARD_MIN_WIDTH + CARD_GAP)));
+}
+
+function measureGrid() {
+    const width = grid.clientWidth || CARD_MIN_WIDTH;
+    const cols = gridColumns();
+    const cardWidth = (width - CARD_GAP * (cols - 1)) / cols;
+    const rowHeight = Math.round(cardWidth * 1.5 + CARD_META_HEIGHT) + CARD_GAP;
+    layout = {cols, cardWidth, rowHeight};
+    grid.style.height = Math.ceil(resultCount() / cols) * rowHeight + 'px';
+}
+
+function releaseCard(card) {
+    cancelPoster(card.querySelector('.poster'));
+    card.style.display = 'none';
+    freeCards.push(card);
+}
+
+function acquireCard() {
+    const card = freeCards.pop();
+    if(card) {
+        card.style.display = '';
+        return card;
+    }
+    return grid.appendChild(createCard());
+}
+
+function placeCard(card, i) {
+    const {cols, cardWidth, rowHeight} = layout;
+    card.style.left = (i % cols) * (cardWidth + CARD_GAP) + 'px';
+    card.style.top = Math.floor(i / cols) * rowHeight + 'px';
+    card.style.width = cardWidth + 'px';
+    card.style.height = (rowHeight - CARD_GAP) + 'px';
+}
+
+/* con un'altra larghezza (resize, rotazione) anche le card già visibili vanno spostate */
+function resizeWindow() {
+    const {cols, cardWidth} = layout;
+    measureGrid();
+    if(layout.cols !== cols || layout.cardWidth !== cardWidth) activeCards.forEach(placeCard);
+    scheduleWindow();
+}
+
+function resetWindow() {
+    activeCards.forEach(releaseCard);
+    activeCards.clear();
+    measureGrid();
+    updateWindow();
+}
+
+function scheduleWindow() {
+    if(windowQueued) return;
+    windowQueued = true;
+    requestAnimationFrame(() => { windowQueued = false; updateWindow(); });
+}
+
+function updateWindow() {
+    const {cols, rowHeight} = layout;
+    const total = resultCount();
+    const top = grid.getBoundingClientRect().top;
+    const firstRow = Math.max(0, Math.floor(-top / rowHeight) - ROW_OVERSCAN);
+    const lastRow = Math.floor((window.innerHeight - top) / rowHeight) + ROW_OVERSCAN;
+    const start = firstRow * cols, end = Math.min(total, (lastRow + 1) * cols);
+
+    activeCards.forEach((card, i) => {
+        if(i < start || i >= end) { releaseCard(card); activeCards.delete(i); }
+    });
+    const missing = new Set();
+    const list = store[currentType] || [];
+    for(let i = start; i < end; i++) {
+        if(activeCards.has(i)) continue;
+        const pos = results ? results[i] : i;
+        if(!list[pos]) { missing.add(Math.floor(pos / catalog.pageSize)); continue; }
+        const card = acquireCard();
+        fillCard(card, list[pos], i < cols);
+        placeCard(card, i);
+        activeCards.set(i, card);
+    }
+    if(missing.size) {
+        const token = renderToken;
+        Promise.all([...missing].map(p => loadPage(currentType, p)))
+            .then(() => { if(token === renderToken) scheduleWindow(); });
+    }
+}
+
+if(VIRTUAL_GRID) {
+    grid.classList.add('virtual');
+    window.addEventListener('scroll', scheduleWindow, {passive: true});
+    window.addEventListener('resize', resizeWindow);
+}
+
+function populateGenres(){
+    const genres = catalog.types[currentType] ? catalog.types[currentType].genres : [];
+    const sel=document.getElementById('genreSelect');
+    sel.innerHTML='<option value="all">Tutti i generi</option><option value="favorites">★ Preferiti</option>';
+    genres.forEach(g=>{
+        const o=document.createElement('option');
+        o.value=g;
+        o.textContent=catalog.genres[g];
+        sel.appendChild(o);
+    });
+}
+
+function updateType(t){
+    currentType=t;
+    populateGenres();
+    render(true);
+}
+
+/* Eventi UI */
+document.getElementById('typeSelect').onchange=e=>updateType(e.target.value);
+document.getElementById('genreSelect').onchange=()=>render(true);
+document.getElementById('searchBox').oninput=debounce(()=>render(true), 200);
+if(!VIRTUAL_GRID) document.getElementById('loadMore').onclick=()=>render(false);
+
+/* stato iniziale nella history */
+history.replaceState({page:"grid"}, "", "#grid");
+
+prerendered = adoptPrerendered();
+updateType('movie');
+showLatest();
+
+/* cache offline per le visite successive (sw.js, vedi service_worker.py) */
+if(SERVICE_WORKER && 'serviceWorker' in navigator)
+    window.addEventListener('load', () => navigator.serviceWorker.register(SW_URL).catch(() => {}));
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+static_assets.py
+
+Foglio di stile e script di index.html come file separati dai dati.
+- I sorgenti stanno in static/ (app.css, app.js) e si modificano lì, senza
+  le graffe raddoppiate delle f-string
+- Ad ogni build vengono copiati in ASSET_DIR con l'hash del contenuto nel nome
+  (app.<hash>.js): finché non cambiano, il browser li tiene in cache anche se
+  i dati del catalogo cambiano ogni giorno
+- Le copie delle build precedenti vengono rimosse
+"""
+
+import hashlib
+import os
+
+# --- Config ---
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+ASSET_DIR = "assets"
+ASSETS = ("app.css", "app.js")
+HASH_LENGTH = 10
+
+
+def write_assets(names=ASSETS, asset_dir=ASSET_DIR):
+    """Copia i sorgenti in asset_dir con nome hashato; restituisce {nome: percorso}."""
+    os.makedirs(asset_dir, exist_ok=True)
+    paths = {}
+    for name in names:
+        with open(os.path.join(STATIC_DIR, name), "rb") as f:
+            data = f.read()
+        stem, ext = os.path.splitext(name)
+        hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+        path = os.path.join(asset_dir, hashed)
+        if not os.path.exists(path):
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+        paths[name] = f"{asset_dir}/{hashed}"
+    used = {os.path.basename(p) for p in paths.values()}
+    for old in os.listdir(asset_dir):
+        if old not in used:
+            os.remove(os.path.join(asset_dir, old))
+    return paths
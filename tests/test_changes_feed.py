@@ -0,0 +1,101 @@
+"""
+Aggiornamento dal feed /changes (ingest.py --changes) contro mock_api.py: si
+riscaricano solo gli ID elencati nel feed, i falliti restano in "pending" per
+la volta successiva, un feed incompleto non fa avanzare la finestra e gli shard
+locali di merge_shards.py scaricano il feed una volta sola.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import mock_api  # noqa: E402
+from catalog_state import in_shard  # noqa: E402
+from mock_api import MockAPI  # noqa: E402
+
+
+class ChangesFeedTest(unittest.TestCase):
+    def setUp(self):
+        self.api = MockAPI(size=40).start()   # film 1000-1029, serie 1000-1009
+        self.workdir = tempfile.TemporaryDirectory()
+        self.env = dict(os.environ, **self.api.env(), TMDB_CACHE="0", TMDB_RATE="500", PYTHONPATH=REPO_DIR)
+        for name in ("GITHUB_OUTPUT", "BUILD_REPORT", "BUILD_PROFILE", "CATALOG_PATH", "CATALOG_JOURNAL"):
+            self.env.pop(name, None)
+        self.ingest()   # prima esecuzione: rotazione e inizio della finestra del feed
+
+    def tearDown(self):
+        self.api.stop()
+        self.workdir.cleanup()
+
+    def ingest(self):
+        """Esegue ingest.py --changes e restituisce i dettagli richiesti al server."""
+        self.api.detail_log.clear()
+        subprocess.run([sys.executable, os.path.join(REPO_DIR, "ingest.py"), "--changes"], cwd=self.workdir.name,
+                       env=self.env, check=True, capture_output=True)
+        return set(self.api.detail_log)
+
+    def state(self):
+        with open(os.path.join(self.workdir.name, "catalog.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_refetches_only_listed_ids(self):
+        self.api.changes = {"movie": [1003, 1007, 5000], "tv": [1002]}   # 5000 non è nel catalogo
+        self.assertEqual(self.ingest(), {("movie", 1003), ("movie", 1007), ("tv", 1002)})
+        self.assertEqual(len(self.state()["types"]["movie"]["records"]), 30)
+
+    def test_failed_refresh_is_retried_next_time(self):
+        self.api.changes = {"movie": [1003, 1007]}
+        self.api.not_found = {1007}
+        self.assertEqual(self.ingest(), {("movie", 1003), ("movie", 1007)})
+        movie = self.state()["types"]["movie"]
+        self.assertEqual(movie["pending"], ["1007"])
+        self.assertIn("1007", movie["records"])   # il record precedente resta
+
+        self.api.changes, self.api.not_found = {}, set()
+        self.assertEqual(self.ingest(), {("movie", 1007)})
+        self.assertEqual(self.state()["types"]["movie"]["pending"], [])
+
+    def test_incomplete_feed_keeps_window(self):
+        since = self.state()["changes_since"]
+        self.api.changes = {"movie": [1001, 1002, 1003], "tv": [1004]}
+        self.api.broken_changes_page = 2
+        page_size, mock_api.CHANGES_PAGE_SIZE = mock_api.CHANGES_PAGE_SIZE, 2   # feed dei film su due pagine
+        try:
+            fetched = self.ingest()
+        finally:
+            mock_api.CHANGES_PAGE_SIZE = page_size
+        # i film tornano alla rotazione (nessun record scaduto), le serie usano il feed
+        self.assertEqual(fetched, {("tv", 1004)})
+        self.assertEqual(self.state()["changes_since"], since)
+
+    def test_local_shards_share_one_feed(self):
+        self.api.changes = {"movie": [1003, 1007], "tv": [1002]}
+        pages, changes_body = [], self.api.changes_body
+        self.api.changes_body = lambda type_, page: pages.append(type_) or changes_body(type_, page)
+        self.api.detail_log.clear()
+        subprocess.run([sys.executable, os.path.join(REPO_DIR, "merge_shards.py"), "--local", "3", "--changes"],
+                       cwd=self.workdir.name, env=self.env, check=True, capture_output=True)
+        self.assertEqual(sorted(pages), ["movie", "tv"])   # una pagina per tipo, non una per shard
+        self.assertEqual(set(self.api.detail_log), {("movie", 1003), ("movie", 1007), ("tv", 1002)})
+        self.assertEqual(len(self.state()["types"]["movie"]["records"]), 30)
+        self.assertEqual(os.listdir(self.workdir.name), ["catalog.json"])
+
+    def test_quiet_shard_advances_window(self):
+        since = self.state()["changes_since"]
+        changed = next(i for i in range(1000, 1030) if in_shard(str(i), (1, 2)))
+        self.api.changes = {"movie": [changed]}   # lo shard 2 non ha niente da aggiornare
+        self.api.detail_log.clear()
+        subprocess.run([sys.executable, os.path.join(REPO_DIR, "merge_shards.py"), "--local", "2", "--changes"],
+                       cwd=self.workdir.name, env=self.env, check=True, capture_output=True)
+        self.assertEqual(set(self.api.detail_log), {("movie", changed)})
+        self.assertGreater(self.state()["changes_since"], since)
+
+
+if __name__ == "__main__":
+    unittest.main()
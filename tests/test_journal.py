@@ -0,0 +1,53 @@
+"""
+Journal di ripresa (catalog_state.py): una riga troncata da un'interruzione non
+deve far perdere né le voci precedenti né quelle scritte dalla build ripresa.
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from catalog_state import Journal, read_journal  # noqa: E402
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.workdir.name, "catalog.json.journal")
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def write(self, *ids):
+        journal = Journal(self.path)
+        for tmdb_id in ids:
+            journal.append("movie", tmdb_id, {"title": f"Film {tmdb_id}"})
+        journal.close()
+
+    def read_ids(self):
+        return sorted(read_journal(self.path).get("movie", {}))
+
+    def test_resume_after_truncated_line(self):
+        self.write("1", "2", "3")
+        with open(self.path, "rb+") as f:   # interruzione a metà della terza riga
+            f.truncate(os.path.getsize(self.path) - 10)
+        self.assertEqual(self.read_ids(), ["1", "2"])
+
+        self.write("4", "5")
+        self.assertEqual(self.read_ids(), ["1", "2", "4", "5"])
+
+    def test_skips_bad_lines(self):
+        self.write("1")
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"type":"movie","id":\n')
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"type":"movie","id":"2","entry":{},"fetched_at":9e99}\n')
+        self.assertEqual(self.read_ids(), ["1", "2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
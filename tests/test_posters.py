@@ -0,0 +1,79 @@
+"""
+Miniature delle locandine (posters.py) contro le immagini di mock_api.py:
+download e varianti WebP, locandine invariate saltate, file non più usati
+rimossi.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from mock_api import MockAPI  # noqa: E402
+from posters import POSTER_WIDTHS, pillow_available  # noqa: E402
+
+
+def record(name):
+    return {"entry": {"poster": f"https://image.tmdb.org/t/p/w300/{name}"}, "fetched_at": 0}
+
+
+@unittest.skipUnless(pillow_available(), "serve Pillow")
+class PostersTest(unittest.TestCase):
+    def setUp(self):
+        self.api = MockAPI(size=0).start()
+        self.workdir = tempfile.TemporaryDirectory()
+        self.dataset = os.path.join(self.workdir.name, "catalog.json")
+        self.poster_dir = os.path.join(self.workdir.name, "posters")
+        self.env = dict(os.environ, **self.api.env(), PYTHONPATH=REPO_DIR)
+        for name in ("POSTER_DIR", "BUILD_REPORT", "BUILD_PROFILE"):
+            self.env.pop(name, None)
+
+    def tearDown(self):
+        self.api.stop()
+        self.workdir.cleanup()
+
+    def run_posters(self, records):
+        """Scrive il dataset, esegue posters.py e restituisce (dataset aggiornato, locandine richieste)."""
+        state = {"types": {"movie": {"ids": list(records), "records": records}}}
+        if os.path.exists(self.dataset):
+            with open(self.dataset, encoding="utf-8") as f:
+                state["posters"] = json.load(f).get("posters", {})
+        with open(self.dataset, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        self.api.image_log.clear()
+        subprocess.run([sys.executable, os.path.join(REPO_DIR, "posters.py")], cwd=self.workdir.name,
+                       env=self.env, check=True, capture_output=True)
+        with open(self.dataset, encoding="utf-8") as f:
+            return json.load(f), sorted(self.api.image_log)
+
+    def files(self):
+        return sorted(os.listdir(self.poster_dir))
+
+    def test_download_skip_and_cleanup(self):
+        state, fetched = self.run_posters({"1": record("p1.jpg"), "2": record("p2.jpg"), "3": record("p3.jpg")})
+        self.assertEqual(fetched, ["p1.jpg", "p2.jpg", "p3.jpg"])
+        keys = {r["entry"]["thumb"] for r in state["types"]["movie"]["records"].values()}
+        self.assertEqual(len(keys), 3)
+        self.assertEqual(self.files(), sorted(f"{k}-{w}.webp" for k in keys for w in POSTER_WIDTHS))
+
+        # niente di nuovo: nessun download, stessi file
+        before = self.files()
+        state, fetched = self.run_posters({"1": record("p1.jpg"), "2": record("p2.jpg"), "3": record("p3.jpg")})
+        self.assertEqual(fetched, [])
+        self.assertEqual(self.files(), before)
+
+        # il titolo 3 esce dal catalogo e il 2 cambia locandina: si scarica solo la nuova
+        state, fetched = self.run_posters({"1": record("p1.jpg"), "2": record("p4.jpg")})
+        self.assertEqual(fetched, ["p4.jpg"])
+        self.assertEqual(sorted(state["posters"]), ["/p1.jpg", "/p4.jpg"])
+        keys = {r["entry"]["thumb"] for r in state["types"]["movie"]["records"].values()}
+        self.assertEqual(self.files(), sorted(f"{k}-{w}.webp" for k in keys for w in POSTER_WIDTHS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+"""
+RateGovernor (tmdb_client.py) con un orologio finto: un 429 riduce il ritmo, i
+429 della stessa raffica no, uno successivo al cooldown lo riduce ancora e senza
+altri 429 il ritmo risale.
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import tmdb_client  # noqa: E402
+from tmdb_client import RateGovernor  # noqa: E402
+
+
+class RateGovernorTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(tmdb_client.time, "monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.governor = RateGovernor(40.0)
+
+    def successes(self, seconds, step=0.1, latency=0.05):
+        for _ in range(round(seconds / step)):
+            self.now += step
+            self.governor.on_success(latency)
+
+    def test_cut_again_then_recover(self):
+        self.governor.on_throttle()
+        self.assertEqual(self.governor.rate, 30.0)
+        self.now += 0.5
+        self.governor.on_throttle()   # stessa raffica: nessuna nuova riduzione
+        self.assertEqual(self.governor.rate, 30.0)
+
+        self.successes(0.5)           # durante il cooldown non si sale
+        self.assertEqual(self.governor.rate, 30.0)
+        self.now += 0.1
+        self.governor.on_throttle()   # cooldown finito: il limite è ancora più basso
+        self.assertEqual(self.governor.rate, 22.5)
+        self.assertEqual(self.governor.ceiling, 30.0)
+
+        self.successes(0.8)           # nuovo cooldown
+        self.assertEqual(self.governor.rate, 22.5)
+        self.successes(5.0)
+        self.assertGreater(self.governor.rate, 27.0)
+        self.assertLess(self.governor.rate, 30.0)   # vicino all'ultimo 429 si sale piano
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+"""
+search_index.normalize() e normalize() di static/app.js devono dare lo stesso
+testo, altrimenti le chiavi dell'indice non corrispondono a quelle della
+ricerca. La funzione della pagina viene eseguita con node.
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from search_index import normalize  # noqa: E402
+
+SAMPLE = [
+    "Amélie", "L'uomo ragno: No Way Home", "Città_di-Dio", "Fast & Furious 7", "Ｔｏｋｙｏ ２０２０",
+    "İstanbul", "Straße", "Ærø", "½ Moon", "สวัสดี", "नमस्ते दुनिया", "Привет, мир", "Ελληνικά",
+    "東京物語", "기생충", "مرحبا بالعالم", "שָׁלוֹם", "Pokémon™", "Zoë • Léon", "", "   ",
+]
+
+
+@unittest.skipUnless(shutil.which("node"), "node non disponibile")
+class NormalizeParityTest(unittest.TestCase):
+    def test_same_as_page_script(self):
+        with open(os.path.join(REPO_DIR, "static", "app.js"), encoding="utf-8") as f:
+            source = re.search(r"^function normalize\(text\) \{.*?^\}", f.read(), re.M | re.S).group(0)
+        script = source + "\nconsole.log(JSON.stringify(JSON.parse(process.argv[1]).map(normalize)));"
+        result = subprocess.run(["node", "-e", script, json.dumps(SAMPLE)], capture_output=True, text=True,
+                                check=True)
+        self.assertEqual(json.loads(result.stdout), [normalize(text) for text in SAMPLE])
+
+
+if __name__ == "__main__":
+    unittest.main()
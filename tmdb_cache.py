@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+tmdb_cache.py
+
+Cache persistente su disco (SQLite) delle risposte di dettaglio TMDb.
+- Chiave: (tipo, id, lingua, append_to_response)
+- Scadenza per voce (TMDB_CACHE_TTL in secondi, default 7 giorni) con un
+  piccolo jitter, così le voci non scadono tutte nella stessa notte
+- Cache negativa dei 404 (TMDB_CACHE_NEGATIVE_TTL, default 7 giorni)
+- Numero massimo di voci (TMDB_CACHE_MAX_ENTRIES) con espulsione LRU
+- TMDB_CACHE=0 disattiva la cache
+- Ogni scrittura è una transazione a sé, mai tenuta aperta durante un
+  download: più processi (gli shard locali di merge_shards.py) condividono il
+  file; se il database resta bloccato oltre LOCK_TIMEOUT la voce si tratta come
+  assente invece di far fallire il titolo
+"""
+
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+import build_report
+
+CACHE_PATH = os.getenv("TMDB_CACHE_PATH", ".cache/tmdb.sqlite")
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_NEGATIVE_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 200000
+TTL_JITTER = 0.2
+LOCK_TIMEOUT = 30   # secondi di attesa se un altro processo sta scrivendo
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    type TEXT NOT NULL,
+    id TEXT NOT NULL,
+    language TEXT NOT NULL,
+    append TEXT NOT NULL,
+    body TEXT,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (type, id, language, append)
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+"""
+
+
+class ResponseCache:
+    def __init__(self, path=CACHE_PATH, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=LOCK_TIMEOUT, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    @staticmethod
+    def _key(key):
+        type_, tmdb_id, language, append = key
+        return (type_, str(tmdb_id), language or "", append or "")
+
+    def get(self, key):
+        """Restituisce (trovato, valore); valore None indica un 404 in cache."""
+        key = self._key(key)
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._db.execute(
+                    "SELECT body, expires_at FROM responses"
+                    " WHERE type=? AND id=? AND language=? AND append=?", key
+                ).fetchone()
+                if row is None or row[1] < now:
+                    build_report.count("cache.misses")
+                    return False, None
+                self._write(
+                    "UPDATE responses SET accessed_at=?"
+                    " WHERE type=? AND id=? AND language=? AND append=?", (now,) + key
+                )
+            except sqlite3.OperationalError:
+                build_report.count("cache.errors")
+                return False, None
+        build_report.count("cache.hits")
+        return True, (json.loads(row[0]) if row[0] is not None else None)
+
+    def put(self, key, value):
+        key = self._key(key)
+        now = time.time()
+        ttl = self.ttl if value is not None else self.negative_ttl
+        expires_at = now + ttl * (1 - TTL_JITTER * random.random())
+        body = json.dumps(value, ensure_ascii=False) if value is not None else None
+        with self._lock:
+            try:
+                self._write(
+                    "INSERT OR REPLACE INTO responses"
+                    " (type, id, language, append, body, expires_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)", key + (body, expires_at, now)
+                )
+            except sqlite3.OperationalError:
+                build_report.count("cache.errors")
+
+    def fetch(self, key, loader, refresh=False):
+        """Legge dalla cache oppure chiama loader() e ne memorizza il risultato.
+
+        Con refresh=True la voce in cache viene ignorata e riscritta.
+        """
+        if not refresh:
+            hit, value = self.get(key)
+            if hit:
+                return value
+        value = loader()
+        self.put(key, value)
+        return value
+
+    def _write(self, sql, params):
+        """Esegue e conferma subito, così il lock di scrittura dura solo questa istruzione."""
+        try:
+            self._db.execute(sql, params)
+            self._db.commit()
+        except sqlite3.OperationalError:
+            self._db.rollback()
+            raise
+
+    def evict(self):
+        """Espulsione LRU oltre max_entries; con il database bloccato si rimanda alla prossima volta."""
+        with self._lock:
+            try:
+                count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                excess = count - self.max_entries
+                if excess > 0:
+                    self._write(
+                        "DELETE FROM responses WHERE rowid IN"
+                        " (SELECT rowid FROM responses ORDER BY accessed_at ASC LIMIT ?)", (excess,)
+                    )
+            except sqlite3.OperationalError as e:
+                build_report.count("cache.errors")
+                print(f"Cache TMDb: espulsione non riuscita ({e})", file=sys.stderr)
+
+    def close(self):
+        self.evict()
+        with self._lock:
+            self._db.close()
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def open_cache():
+    if os.getenv("TMDB_CACHE", "1") == "0":
+        return None
+    return ResponseCache(
+        CACHE_PATH,
+        ttl=_env_int("TMDB_CACHE_TTL", DEFAULT_TTL),
+        negative_ttl=_env_int("TMDB_CACHE_NEGATIVE_TTL", DEFAULT_NEGATIVE_TTL),
+        max_entries=_env_int("TMDB_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+    )
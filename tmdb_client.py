@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+tmdb_client.py
+
+Client condiviso da tutti i generatori per le liste vixsrc e le API TMDb.
+- Sessione requests con connessioni keep-alive in pool
+- Limitatore a token bucket (TMDB_RATE richieste/s, default 40) che si adatta
+  ai 429 (rispettando Retry-After) e alla latenza osservata; con più processi
+  in parallelo (shard) ognuno ne usa una quota, così il totale resta TMDB_RATE
+- Ritentativi con backoff esponenziale limitato su errori di rete, 429 e 5xx
+- Cache opzionale delle risposte di dettaglio (vedi tmdb_cache.py)
+- Stagioni TV richieste a gruppi di SEASON_BATCH con append_to_response
+- Feed /changes di TMDb per sapere quali titoli sono cambiati
+- Liste vixsrc scaricate con GET condizionale (ETag, Last-Modified e hash) e
+  lette a blocchi man mano che arrivano, senza caricare tutta la risposta
+- Latenze per endpoint, ritentativi e 429 registrati nel report della build
+  (vedi build_report.py)
+- Radici delle API configurabili (VIXSRC_API_ROOT, TMDB_API_ROOT), ad esempio
+  per puntare a un server di prova locale
+"""
+
+import hashlib
+import math
+import os
+import random
+import sys
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import build_report
+from fetch_engine import get_concurrency, iter_fetch
+from json_stream import CHUNK_SIZE, iter_array
+
+# --- Config ---
+VIXSRC_API_ROOT = os.getenv("VIXSRC_API_ROOT", "https://vixsrc.to/api").rstrip("/")
+TMDB_API_ROOT = os.getenv("TMDB_API_ROOT", "https://api.themoviedb.org/3").rstrip("/")
+SRC_URLS = {
+    "movie": VIXSRC_API_ROOT + "/list/movie?lang=it",
+    "tv": VIXSRC_API_ROOT + "/list/tv?lang=it"
+}
+TMDB_BASE = TMDB_API_ROOT + "/{type}/{id}"
+TMDB_CHANGES = TMDB_API_ROOT + "/{type}/changes"
+HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; script/1.0)"}
+
+DEFAULT_RATE = 40.0
+MIN_RATE = 1.0
+RATE_STEP = 2.0            # incremento additivo (richieste/s) per ogni secondo senza 429
+BURST_SECONDS = 0.25       # dimensione del bucket in secondi di ritmo corrente
+LATENCY_FACTOR = 3.0       # oltre 3x la latenza di riferimento si rallenta...
+LATENCY_SUSTAIN = 2.0      # ...ma solo se l'aumento dura almeno 2 secondi
+LATENCY_SMOOTHING = 0.2
+BASELINE_WINDOW = 60.0     # secondi: la latenza di riferimento segue la media degli ultimi minuti
+THROTTLE_FACTOR = 0.75     # riduzione moltiplicativa del ritmo dopo un 429
+THROTTLE_COOLDOWN = 1.0    # secondi dopo un 429 senza ulteriori riduzioni né aumenti
+CEILING_MARGIN = 0.9       # sopra il 90% del ritmo dell'ultimo 429...
+CEILING_PROBE = 0.1        # ...l'aumento additivo è 10 volte più lento
+MAX_RETRIES = 5
+MAX_THROTTLE_RETRIES = 20  # i 429 indicano quando riprovare: si insiste di più
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+SEASON_BATCH = 20          # massimo di sotto-richieste accettate da append_to_response
+
+
+def get_api_key():
+    key = os.getenv("TMDB_API_KEY")
+    if not key:
+        print("Errore: manca TMDB_API_KEY", file=sys.stderr)
+        sys.exit(1)
+    return key
+
+
+def item_id(item):
+    """ID TMDb di un elemento della lista vixsrc, o None."""
+    if isinstance(item, dict):
+        for key in ("tmdb_id", "tmdbId", "id"):
+            if key in item and item[key]:
+                return str(item[key])
+    return None
+
+
+def _env_rate():
+    try:
+        return max(MIN_RATE, float(os.getenv("TMDB_RATE", DEFAULT_RATE)))
+    except ValueError:
+        return DEFAULT_RATE
+
+
+class RateGovernor:
+    """Token bucket con aumento additivo e riduzione moltiplicativa (AIMD)."""
+
+    def __init__(self, rate=DEFAULT_RATE, min_rate=MIN_RATE):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.tokens = 1.0
+        self.blocked_until = 0.0
+        self._throttled_until = 0.0
+        self.ceiling = None        # ritmo al quale è arrivato l'ultimo 429
+        self._increased = time.monotonic()
+        self.baseline = None       # media lenta delle latenze, per riconoscere un aumento
+        self.latency = None
+        self._slow_since = None    # da quando la latenza è oltre LATENCY_FACTOR x baseline
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        capacity = max(1.0, self.rate * BURST_SECONDS)
+        self.tokens = min(capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self, latency):
+        with self._lock:
+            now = time.monotonic()
+            elapsed, self._increased = now - self._increased, now
+            if self.latency is None:
+                self.latency = self.baseline = latency
+            else:
+                self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+                # media con decadimento nel tempo: dopo un aumento duraturo diventa il nuovo normale
+                self.baseline += (1 - math.exp(-elapsed / BASELINE_WINDOW)) * (latency - self.baseline)
+            if self.latency <= LATENCY_FACTOR * self.baseline:
+                self._slow_since = None
+            elif self._slow_since is None:
+                self._slow_since = now
+            if self._slow_since is not None and now - self._slow_since >= LATENCY_SUSTAIN:
+                self.rate = max(self.min_rate, self.rate * (1 - 0.1 * min(1.0, elapsed)))
+            elif now >= self._throttled_until:
+                step = RATE_STEP * elapsed
+                if self.ceiling is not None and self.rate >= self.ceiling * CEILING_MARGIN:
+                    step *= CEILING_PROBE   # vicino al limite noto si sale piano
+                self.rate = min(self.max_rate, self.rate + step)
+
+    def on_throttle(self, retry_after=None):
+        with self._lock:
+            now = time.monotonic()
+            # i 429 arrivano a raffica (richieste in volo, finestra del server):
+            # si riduce al massimo una volta per THROTTLE_COOLDOWN
+            cut = now >= self._throttled_until
+            if cut:
+                self.ceiling = self.rate
+                self.rate = max(self.min_rate, self.rate * THROTTLE_FACTOR)
+            self.tokens = 0.0
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self.blocked_until = max(self.blocked_until, now + pause)
+            if cut:
+                # solo la riduzione fa ripartire il cooldown: i 429 successivi non lo prolungano
+                self._throttled_until = self.blocked_until + THROTTLE_COOLDOWN
+
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def _backoff(attempt):
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+    return delay * (0.5 + random.random() / 2)
+
+
+class TMDbClient:
+    def __init__(self, api_key, cache=None, governor=None, pool_size=None, rate_share=1):
+        """`rate_share`: processi che si dividono TMDB_RATE (ad esempio gli shard di ingest.py)."""
+        self.api_key = api_key
+        self.cache = cache
+        self.governor = governor or RateGovernor(_env_rate() / rate_share)
+        pool_size = pool_size or get_concurrency()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, url, params=None, timeout=15, throttle=True, allow_404=False, headers=None,
+                endpoint="other", stream=False):
+        """GET con ritentativi; restituisce la risposta, o None per i 404 se allow_404.
+
+        `endpoint` è il nome con cui latenze e ritentativi finiscono nel report della build;
+        con stream il corpo della risposta va letto a blocchi (iter_content) dal chiamante.
+        """
+        attempt = throttled = 0
+        while True:
+            if throttle:
+                self.governor.acquire()
+            start = time.monotonic()
+            try:
+                r = self.session.get(url, params=params, timeout=timeout, headers=headers, stream=stream)
+            except (requests.ConnectionError, requests.Timeout):
+                build_report.count(f"{endpoint}.network_errors")
+                if attempt >= MAX_RETRIES:
+                    raise
+                attempt += 1
+                build_report.count(f"{endpoint}.retries")
+                time.sleep(_backoff(attempt))
+                continue
+            build_report.observe(endpoint, time.monotonic() - start)
+            if r.status_code == 404 and allow_404:
+                build_report.count(f"{endpoint}.not_found")
+                return None
+            if r.status_code == 429 and throttled < MAX_THROTTLE_RETRIES:
+                r.close()
+                throttled += 1
+                build_report.count(f"{endpoint}.throttled")
+                if throttle:
+                    self.governor.on_throttle(_retry_after(r))
+                else:
+                    time.sleep(_retry_after(r) or _backoff(throttled))
+                continue
+            if r.status_code in RETRY_STATUS and r.status_code != 429 and attempt < MAX_RETRIES:
+                r.close()
+                attempt += 1
+                build_report.count(f"{endpoint}.retries")
+                time.sleep(_retry_after(r) or _backoff(attempt))
+                continue
+            r.raise_for_status()
+            if throttle:
+                self.governor.on_success(time.monotonic() - start)
+            return r
+
+    def get_json(self, url, params=None, timeout=15, throttle=True, allow_404=False, endpoint="other"):
+        r = self.request(url, params, timeout, throttle, allow_404, endpoint=endpoint)
+        return None if r is None else r.json()
+
+    def fetch_list(self, url, source=None):
+        """Lista vixsrc con GET condizionale, letta a blocchi mentre arriva.
+
+        `source` ha ETag, Last-Modified e sha256 della risposta precedente;
+        restituisce (ID, source aggiornato), con ID None se la lista non è cambiata.
+        """
+        source = source or {}
+        headers = {}
+        if source.get("etag"):
+            headers["If-None-Match"] = source["etag"]
+        if source.get("last_modified"):
+            headers["If-Modified-Since"] = source["last_modified"]
+        r = self.request(url, timeout=20, throttle=False, headers=headers, endpoint="list", stream=True)
+        with r:
+            if r.status_code == 304:
+                return None, source
+            digest = hashlib.sha256()
+
+            def chunks():
+                for chunk in r.iter_content(CHUNK_SIZE):
+                    digest.update(chunk)
+                    yield chunk
+
+            ids = [i for i in map(item_id, iter_array(chunks())) if i is not None]
+        new_source = {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified"),
+                      "sha256": digest.hexdigest()}
+        if new_source["sha256"] == source.get("sha256"):
+            return None, new_source
+        return ids, new_source
+
+    def details(self, type_, tmdb_id, language="it-IT", append="", refresh=False):
+        if self.cache is None:
+            return self._details(type_, tmdb_id, language, append)
+        return self.cache.fetch((type_, tmdb_id, language, append),
+                                lambda: self._details(type_, tmdb_id, language, append), refresh)
+
+    def _details(self, type_, tmdb_id, language, append):
+        params = {"api_key": self.api_key, "language": language}
+        if append:
+            params["append_to_response"] = append
+        endpoint = "seasons" if "season/" in append else "details"
+        return self.get_json(TMDB_BASE.format(type=type_, id=tmdb_id), params=params, allow_404=True,
+                             endpoint=endpoint)
+
+    def seasons(self, tmdb_id, numbers, language="it-IT", refresh=False):
+        """Dict numero -> stagione TMDb, con SEASON_BATCH stagioni per chiamata."""
+        numbers = list(numbers)
+        out = {}
+        for start in range(0, len(numbers), SEASON_BATCH):
+            batch = numbers[start:start + SEASON_BATCH]
+            append = ",".join(f"season/{n}" for n in batch)
+            info = self.details("tv", tmdb_id, language, append, refresh) or {}
+            for n in batch:
+                if info.get(f"season/{n}"):
+                    out[n] = info[f"season/{n}"]
+        return out
+
+    def changes(self, type_, start_date, end_date=None):
+        """ID cambiati su TMDb tra due date (YYYY-MM-DD); None se il feed è incompleto."""
+        url = TMDB_CHANGES.format(type=type_)
+        params = {"api_key": self.api_key, "start_date": start_date}
+        if end_date:
+            params["end_date"] = end_date
+
+        def page(number):
+            return self.get_json(url, params={**params, "page": number}, endpoint="changes")
+
+        try:
+            first = page(1)
+        except requests.RequestException as e:
+            print(f"Errore TMDb changes {type_}: {e}", file=sys.stderr)
+            return None
+        pages = [first] + [data for _, data in iter_fetch(page, range(2, (first.get("total_pages") or 1) + 1))]
+        if any(data is None for data in pages):
+            return None
+        return {str(item["id"]) for data in pages for item in data.get("results", []) if item.get("id")}
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
@@ -2,7 +2,11 @@
 """
 tvmov.py
 
-Genera una pagina HTML con locandine da TMDb partendo dalla lista di Vix.
+Genera una pagina HTML con locandine da TMDb partendo dalla lista di Vix
+(dal dataset scritto da ingest.py, percorso opzionale come primo argomento;
+--report e --profile come in build_report.py). Il dataset si legge un
+record alla volta tenendo solo i campi della griglia, e la pagina viene
+scritta a pezzi man mano che è generata, senza comporla tutta in memoria.
 - Film e Serie TV (due tendine: Movies / Series)
 - Ricerca per titolo
 - Filtro per genere
@@ -11,59 +15,26 @@ Genera una pagina HTML con locandine da TMDb partendo dalla lista di Vix.
 - Per le Serie: tendine per stagione ed episodio
 """
 
-import os, sys, requests
+import argparse
+
+import build_report
+from catalog_state import STATE_PATH, stream_entries
+from data_shards import script_json
+from entries import genre_dictionary
+from json_stream import iter_columns, write_stream
+from posters import poster_config
 
 # --- Config ---
-SRC_URLS = {
-    "movie": "https://vixsrc.to/api/list/movie?lang=it",
-    "tv": "https://vixsrc.to/api/list/tv?lang=it"
-}
-TMDB_BASE = "https://api.themoviedb.org/3/{type}/{id}"
-TMDB_IMAGE_BASE = "https://image.tmdb.org/t/p/w300"
-VIX_LINK_MOVIE = "https://vixsrc.to/movie/{}/?"
 VIX_LINK_SERIE = "https://vixsrc.to/tv/{}/{}/{}"
+GRID_FIELDS = ("id", "title", "poster", "thumb", "genres", "vote", "link", "type", "seasons", "episodes")
 OUTPUT_HTML = "tvmov.html"
-HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; script/1.0)"}
-
-
-def get_api_key():
-    key = os.getenv("TMDB_API_KEY")
-    if not key:
-        print("Errore: manca TMDB_API_KEY", file=sys.stderr)
-        sys.exit(1)
-    return key
-
-
-def fetch_list(url):
-    r = requests.get(url, headers=HEADERS, timeout=20)
-    r.raise_for_status()
-    return r.json()
-
-
-def extract_ids(data):
-    ids = []
-    items = data if isinstance(data, list) else data.get("results", [])
-    for item in items:
-        if not isinstance(item, dict):
-            continue
-        for key in ("tmdb_id", "tmdbId", "id"):
-            if key in item and item[key]:
-                ids.append(str(item[key]))
-                break
-    return sorted(set(ids), key=int)
-
-
-def tmdb_get(api_key, type_, tmdb_id, language="it-IT"):
-    url = TMDB_BASE.format(type=type_, id=tmdb_id)
-    r = requests.get(url, params={"api_key": api_key, "language": language}, timeout=15)
-    if r.status_code == 404:
-        return None
-    r.raise_for_status()
-    return r.json()
 
 
 def build_html(entries):
-    parts = [
+    """Pezzi della pagina, con i dati del catalogo generati a blocchi (vedi json_stream.py)."""
+    genres = genre_dictionary(entries)
+    genre_ids = {name: gid for gid, name in enumerate(genres)}
+    head = [
         "<!doctype html>",
         "<html lang='it'><head><meta charset='utf-8'>",
         "<meta name='viewport' content='width=device-width,initial-scale=1'>",
@@ -75,7 +46,7 @@ def build_html(entries):
         "input,select{padding:8px;font-size:14px;border-radius:4px;border:none;}",
         ".grid{display:grid;grid-template-columns:repeat(auto-fill,minmax(160px,1fr));gap:12px;}",
         ".card{position:relative;cursor:pointer;}",
-        ".poster{width:100%;border-radius:6px;display:block;}",
+        ".poster{width:100%;height:auto;border-radius:6px;display:block;}",
         ".badge{position:absolute;bottom:8px;right:8px;background:rgba(0,0,0,0.7);color:#fff;",
         "padding:2px 6px;font-size:12px;border-radius:4px;}",
         "#loadMore{display:block;margin:20px auto;padding:10px 20px;font-size:16px;",
@@ -105,7 +76,20 @@ def build_html(entries):
         "<button class='closeBtn' onclick='closePlayer()'>×</button>",
         "<video controls id='videoPlayer' src=''></video></div>",
         "<script>",
-        f"const allData = {entries};",
+        "function unpack(cols){const keys=Object.keys(cols);const n=keys.length?cols[keys[0]].length:0;",
+        " return Array.from({length:n},(_,i)=>{const m={};keys.forEach(k=>{m[k]=cols[k][i];});return m;});}",
+        f"const genreNames = {script_json(genres)};",
+    ]
+    tail = [
+        f"const posters = {script_json(poster_config())};",
+        "// miniature WebP locali (posters.py) se ci sono, altrimenti la locandina TMDb",
+        "function posterAttrs(m,size){if(!m.thumb)return `src='${m.poster}'`;",
+        " const set=posters.widths.map(w=>`${posters.dir}/${m.thumb}-${w}.webp ${w}w`).join(', ');",
+        " return `srcset='${set}' sizes='${size}px' src='${posters.dir}/${m.thumb}-${posters.widths[posters.widths.length-1]}.webp'`;}",
+        "// la prima riga ha priorità alta, le altre si caricano quando si avvicinano",
+        "function posterHints(first){return first?\"loading='eager' fetchpriority='high'\":\"loading='lazy'\";}",
+        "// le locandine non ancora arrivate si annullano quando la griglia si svuota",
+        "function clearGrid(){grid.querySelectorAll('.poster').forEach(i=>{if(!i.complete){i.srcset='';i.removeAttribute('src');}});grid.innerHTML='';}",
         "let currentType='movie',currentList=[],shown=0,step=40,currentShow=null;",
         "const grid=document.getElementById('moviesGrid');",
         "const overlay=document.getElementById('playerOverlay');",
@@ -167,19 +151,20 @@ def build_html(entries):
         "}",
         "document.addEventListener('keydown', handleKeyDown);",
         "function render(reset=false){",
-        "   if(reset){grid.innerHTML='';shown=0;}let count=0;",
+        "   if(reset){clearGrid();shown=0;}let count=0;",
+        "   const cols=Math.max(1,Math.floor((grid.clientWidth+12)/172)),cw=Math.round((grid.clientWidth-12*(cols-1))/cols)||160;",
         "   const s=document.getElementById('searchBox').value.toLowerCase();",
         "   const g=document.getElementById('genreSelect').value;",
         "   while(shown<currentList.length && count<step){",
         "       const m=currentList[shown++];",
-        "       if((g==='all'||m.genres.includes(g))&&m.title.toLowerCase().includes(s)){",
+        "       if((g==='all'||m.genres.includes(+g))&&m.title.toLowerCase().includes(s)){",
         "           const card=document.createElement('div');card.className='card';",
-        "           card.innerHTML=`<img class='poster' src='${m.poster}' alt='${m.title}'><div class='badge'>★ ${m.vote}</div>`;",
+        "           card.innerHTML=`<img class='poster' ${posterHints(reset&&count<cols)} width='160' height='240' decoding='async' ${posterAttrs(m,cw)} alt='${m.title}'><div class='badge'>★ ${m.vote}</div>`;",
         "           card.onclick=()=>openPlayer(m);grid.appendChild(card);count++;}}}",
         "function populateGenres(){const set=new Set();",
         "   currentList.forEach(m=>m.genres.forEach(g=>set.add(g)));",
         "   const sel=document.getElementById('genreSelect');sel.innerHTML='<option value=\"all\">Tutti i generi</option>';",
-        "   [...set].sort().forEach(g=>{const o=document.createElement('option');o.value=o.textContent=g;sel.appendChild(o);});}",
+        "   [...set].sort((a,b)=>a-b).forEach(g=>{const o=document.createElement('option');o.value=g;o.textContent=genreNames[g];sel.appendChild(o);});}",
         "function updateType(t){currentType=t;currentList=allData.filter(x=>x.type===t);populateGenres();render(true);}",
         "document.getElementById('typeSelect').onchange=e=>updateType(e.target.value);",
         "document.getElementById('genreSelect').onchange=()=>render(true);",
@@ -188,48 +173,27 @@ def build_html(entries):
         "updateType('movie');",
         "</script></body></html>"
     ]
-    return "\n".join(parts)
+    yield "\n".join(head) + "\nconst allData = unpack("
+    yield from iter_columns(entries, GRID_FIELDS, genre_ids, escape_script=True)
+    yield ");\n" + "\n".join(tail)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=f"Genera {OUTPUT_HTML} dal dataset del catalogo (vedi ingest.py)")
+    parser.add_argument("dataset", nargs="?", default=STATE_PATH, help=f"percorso del dataset (default {STATE_PATH})")
+    build_report.add_arguments(parser)
+    return parser.parse_args(argv)
+
 
 def main():
-    api_key = get_api_key()
-    entries = []
-    for type_, url in SRC_URLS.items():
-        data = fetch_list(url)
-        ids = extract_ids(data)
-        for tmdb_id in ids:
-            try:
-                info = tmdb_get(api_key, type_, tmdb_id)
-            except Exception as e:
-                print(f"Errore TMDb {tmdb_id}: {e}", file=sys.stderr)
-                info = None
-            if not info:
-                continue
-            title = info.get("title") or info.get("name") or f"ID {tmdb_id}"
-            poster = TMDB_IMAGE_BASE + info["poster_path"] if info.get("poster_path") else ""
-            genres = [g["name"] for g in info.get("genres", [])]
-            vote = info.get("vote_average", 0)
-            if type_ == "movie":
-                link = VIX_LINK_MOVIE.format(tmdb_id)
-                seasons, episodes = 0, {}
-            else:
-                link = ""  # si costruisce dopo
-                seasons = info.get("number_of_seasons", 1)
-                episodes = {str(s["season_number"]): s.get("episode_count", 1) for s in info.get("seasons", []) if s.get("season_number")}
-            entries.append({
-                "id": tmdb_id,
-                "title": title,
-                "poster": poster,
-                "genres": genres,
-                "vote": vote,
-                "link": link,
-                "type": type_,
-                "seasons": seasons,
-                "episodes": episodes
-            })
-    html = build_html(entries)
-    with open(OUTPUT_HTML, "w", encoding="utf-8") as f:
-        f.write(html)
-    print(f"Generato {OUTPUT_HTML} con {len(entries)} elementi")
+    args = parse_args()
+    with build_report.session("tvmov", args.report, args.profile):
+        with build_report.stage("load"):
+            entries = stream_entries(args.dataset, GRID_FIELDS)
+        with build_report.stage("html_write"):
+            written = write_stream(OUTPUT_HTML, build_html(entries))
+        build_report.count("output_chars", written)
+        build_report.count("entries", len(entries))
+        print(f"Generato {OUTPUT_HTML} con {len(entries)} elementi")
 
 
 if __name__ == "__main__":